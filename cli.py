@@ -1,18 +1,98 @@
-# from libs import kle, promicro
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+from libs import kcl, kle, preflight
+from libs.config import DEFAULT, Config
+
+# headless tools around the layout files, no fusion needed:
+#
+#   python cli.py compile example/ks-63.json         writes example/ks-63.kcl
+#   python cli.py inspect example/ks-63.kcl
+#   python cli.py validate example/*.json
+#
+# --set NAME=VALUE overrides a config value (in cm, like libs/config.py)
+
+
+def get_config(args):
+    changes = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        if name.strip() not in Config.__dataclass_fields__:
+            raise ValueError(f"unknown config value {name.strip()!r}")
+        changes[name.strip()] = ast.literal_eval(value.strip())
+    return DEFAULT.replace(**changes)
+
+
+def compile_layouts(args) -> int:
+    config = get_config(args)
+    for source in args.files:
+        started = time.perf_counter()
+        with open(source, encoding="utf-8") as f:
+            layout = kle.from_json(json.load(f), config)
+        target = kcl.sidecar_path(source)
+        kcl.dump(layout, target, config)
+        print(f"{target}: {len(layout.keys)} keys, {os.path.getsize(target)} bytes, {(time.perf_counter() - started) * 1e3:.1f} ms")
+    return 0
+
+
+def inspect_layouts(args) -> int:
+    config = get_config(args)
+    for file_path in args.files:
+        print(file_path)
+        if file_path.endswith(".kcl"):
+            info = kcl.header(file_path)
+            info["config matches"] = info["config"] == kcl.config_digest(config).hex()
+            info["shapes match"] = info["shapes"] == kcl.templates_digest(config).hex()
+            for k, v in info.items():
+                print(f"  {k:<16}{v}")
+            if not (info["config matches"] and info["shapes match"]):
+                continue
+        started = time.perf_counter()
+        layout = kcl.load(file_path, config) if file_path.endswith(".kcl") else kle.from_file(file_path, config)
+        print(f"  {'loaded in':<16}{(time.perf_counter() - started) * 1e3:.2f} ms")
+        print(f"  {'name':<16}{layout.name}")
+        print(f"  {'author':<16}{layout.author}")
+        print(f"  {'size':<16}{layout.rect.w * 10:.1f} x {layout.rect.h * 10:.1f} mm")
+        for name, keys in layout.keys.by_template().items():
+            print(f"  {name:<16}{len(keys)} keys")
+    return 0
+
+
+def validate_layouts(args) -> int:
+    config = get_config(args)
+    failed = 0
+    for file_path in args.files:
+        layout = kcl.load(file_path, config) if file_path.endswith(".kcl") else kle.from_file(file_path, config)
+        issues = preflight.check(layout, config)
+        print(f"{file_path}: {len(issues) or 'no'} issues")
+        for issue in issues:
+            print(f"  {issue.kind}: {issue.message}")
+        failed += bool(issues)
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="cli.py", description="keyboard case generator layout tools")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="override a config value")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, run, help in (
+        ("compile", compile_layouts, "compile kle json into .kcl files next to it"),
+        ("inspect", inspect_layouts, "print what a .json or .kcl layout holds"),
+        ("validate", validate_layouts, "run the preflight collision checks"),
+    ):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("files", nargs="+")
+        command.set_defaults(run=run)
+    args = parser.parse_args(argv)
+    try:
+        return args.run(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
 
 
 if __name__ == '__main__':
-    for i in range(0, 5 - 2, 2):
-        print(i)
-    # layout = kle.from_file(r"C:\Users\Klesh\Desktop\ks63\ks-63.json")
-    # print(layout)
-    # for key in layout.keys:
-    #     print(key)
-    # print(layout)
-
-    # for p in params.get_panel_plane_points(layout):
-    #     print(p)
-
-    # print(kle.hole_1u.points)
-    # print(kle.hole_1u.box)
-    # print(promicro.get_promicro_box())
\ No newline at end of file
+    sys.exit(main())
@@ -1,17 +1,128 @@
+import time
+from math import cos, sin
+import adsk
 from adsk.core import *
 from adsk.fusion import *
 from typing import Iterable
+from contextlib import contextmanager
+from collections import namedtuple
 from .libs.common import *
+from .libs.digest import digest
+from .libs.tracer import trace, unwrap
 from .debug import *
 
 
+ProfileInfo = namedtuple("ProfileInfo", "profile min max")
+AreaInfo = namedtuple("AreaInfo", "profile area centroid")
+PointInfo = namedtuple("PointInfo", "point geometry")
+BodyInfo = namedtuple("BodyInfo", "body min max center")
+
+
+def xyz(p) -> tuple:
+    return p.x, p.y, p.z
+
+
+class SketchSnapshot:
+    # plain-tuple copy of what the helpers sort and filter on, every attribute is
+    # read from fusion at most once per sketch revision
+
+    def __init__(self, sketch: Sketch, revision: str):
+        self.sketch = sketch
+        self.revision = revision
+        self._profiles = self._areas = self._points = None
+
+    @property
+    def profiles(self) -> List[ProfileInfo]:
+        if self._profiles is None:
+            self._profiles = []
+            for p in self.sketch.profiles:
+                box = p.boundingBox
+                self._profiles.append(ProfileInfo(p, xyz(box.minPoint), xyz(box.maxPoint)))
+        return self._profiles
+
+    @property
+    def areas(self) -> List[AreaInfo]:
+        if self._areas is None:
+            self._areas = []
+            for info in self.profiles:
+                props = info.profile.areaProperties()
+                self._areas.append(AreaInfo(info.profile, props.area, props.centroid))
+        return self._areas
+
+    @property
+    def points(self) -> List[PointInfo]:
+        if self._points is None:
+            self._points = [PointInfo(p, xyz(p.geometry)) for p in self.sketch.sketchPoints]
+        return self._points
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Progress:
+    # progress dialog over the build stages. yields to fusion's event loop between
+    # stages and on ticks inside long loops, so the ui stays responsive and the
+    # cancel button is seen, a cancel raises Cancelled at the next check
+    INTERVAL = 0.1
+
+    def __init__(self, ui: UserInterface, title: str, stages: int, keys: int):
+        self.dialog = ui.createProgressDialog()
+        self.dialog.isCancelButtonShown = True
+        self.dialog.show(title, "", 0, stages, 0)
+        self.keys = keys
+        self.name = ""
+        self.polled = 0
+
+    def update(self, detail: str = ""):
+        self.dialog.message = f"{self.keys} keys, stage %v/%m: {self.name}{detail}"
+
+    def poll(self, force: bool = False) -> bool:
+        now = time.perf_counter()
+        polled = force or now - self.polled >= self.INTERVAL
+        if polled:
+            self.polled = now
+            adsk.doEvents()
+        if self.dialog.wasCancelled:
+            raise Cancelled(self.name)
+        return polled
+
+    def tick(self, done: int, total: int):
+        if self.poll():
+            self.update(f" ({done}/{total})")
+
+    def wrap(self, stage):
+        @contextmanager
+        def wrapped(name: str):
+            self.name = name
+            self.update()
+            self.poll(True)
+            with stage(name):
+                yield
+            self.dialog.progressValue += 1
+        return wrapped
+
+    def hide(self):
+        self.dialog.hide()
+
+
+def body_info(body: BRepBody) -> BodyInfo:
+    box = body.boundingBox
+    p1, p2 = xyz(box.minPoint), xyz(box.maxPoint)
+    return BodyInfo(body, p1, p2, tuple((a + b) / 2 for a, b in zip(p1, p2)))
+
+
 class SketchHelper:
+    # coordinates closer than this (cm) are taken as the same point
+    SNAP = 1e-5
+
     @classmethod
     def wrap(cls, sketch: Sketch):
         return cls(sketch) if isinstance(sketch, Sketch) else None
 
     def __init__(self, sketch: Sketch):
-        self.sketch = sketch
+        self.sketch = trace(sketch)
+        self._snapshot = None
 
     @property
     def name(self):
@@ -29,12 +140,35 @@ class SketchHelper:
     def is_visible(self, v):
         self.sketch.isVisible = v
 
+    @contextmanager
+    def batch(self):
+        # defer profile computation until all geometry is added, a sketch left
+        # half drawn by a cancel is deleted so the next run draws it again
+        deferred = self.sketch.isComputeDeferred
+        self.sketch.isComputeDeferred = True
+        try:
+            yield self
+        except Cancelled:
+            self.sketch.deleteMe()
+            raise
+        finally:
+            if self.sketch.isValid:
+                self.sketch.isComputeDeferred = deferred
+
+    @property
+    def snapshot(self) -> SketchSnapshot:
+        revision = self.sketch.revisionId
+        if self._snapshot is None or self._snapshot.revision != revision:
+            self._snapshot = SketchSnapshot(self.sketch, revision)
+        return self._snapshot
+
     @property
     def sorted_profiles(self) -> List[Profile]:
-        return sorted(
-            self.sketch.profiles,
-            key=lambda p: (p.boundingBox.minPoint.z, p.boundingBox.minPoint.y, p.boundingBox.minPoint.x),
-        )
+        return [i.profile for i in sorted(self.snapshot.profiles, key=lambda i: i.min[::-1])]
+
+    @property
+    def profiles_by_area(self) -> List[Profile]:
+        return [i.profile for i in sorted(self.snapshot.areas, key=lambda i: i.area)]
 
     @property
     def profiles(self):
@@ -46,7 +180,7 @@ class SketchHelper:
 
     @property
     def points_without_origin(self):
-        return list(filter(lambda p: p.geometry.x != 0 or p.geometry.y != 0 or p.geometry.z != 0, self.points))
+        return [i.point for i in self.snapshot.points if i.geometry != (0, 0, 0)]
 
     @property
     def circles(self) -> SketchCircles:
@@ -56,13 +190,6 @@ class SketchHelper:
     def lines(self) -> SketchLines:
         return self.sketch.sketchCurves.sketchLines
 
-    @property
-    def sorted_lines(self) -> List[SketchLine]:
-        def get_line_center_tuple(line):
-            p1, p2 = line.startSketchPoint.geometry, line.endSketchPoint.geometry
-            return (p1.x + p2.x) / 2, (p1.y + p2.y) / 2, (p1.z + p2.z) / 2
-        return sorted(self.lines, key=lambda l: get_line_center_tuple(l)[::-1])
-
     def translate_point(self, point: Point3D, dx=0, dy=0, dz=0):
         copied = point.copy()
         copied.translateBy(Vector3D.create(dx, dy, dz))
@@ -87,7 +214,7 @@ class SketchHelper:
         )
 
     def add_circle(self, center: Point, radius: float):
-        return self.sketch.sketchCurves.sketchCircles.addByCenterRadius(add_point(sketch, center), radius)
+        return self.sketch.sketchCurves.sketchCircles.addByCenterRadius(self.add_point(center), radius)
 
     def connect_points(self, points, close=False):
         l = len(points)
@@ -101,70 +228,24 @@ class SketchHelper:
         points = [self.add_point(point) for point in points]
         return self.connect_points(points, True)
 
-    def add_tangent_circle(self, point: SketchPoint, radius: float):
-        line1, line2 = point.connectedEntities
-        other_point = lambda l: l.startSketchPoint if l.startSketchPoint != point else l.endSketchPoint
-        p1, p2 = other_point(line1), other_point(line2)
-        center = Point3D.create(
-            (p1.geometry.x + p2.geometry.x) / 2,
-            (p1.geometry.y + p2.geometry.y) / 2,
-            (p1.geometry.z + p2.geometry.z) / 2,
-        )
-        return self.sketch.sketchCurves.sketchCircles.addByTwoTangents(line1, line2, radius, center)
+    def add_pattern(self, entities, pitch: float, count: int) -> list:
+        # the api has no sketch rectangular pattern, copy the entities along x instead,
+        # doubling the copied block each time so a run takes log2(count) calls
+        entities = list(entities)
+        size, n = len(entities), 1
+        while n < count:
+            block = 1
+            while block * 2 <= min(n, count - n):
+                block *= 2
+            transform = Matrix3D.create()
+            transform.translation = Vector3D.create(pitch * n, 0, 0)
+            entities += list(self.sketch.copy(to_collection(entities[:block * size]), transform))
+            n += block
+        return entities
 
     def add_center_circle(self, point: SketchPoint, radius: float):
         self.circles.addByCenterRadius(point, radius)
 
-    def project(self, entities):
-        for entity in entities:
-            self.sketch.project(entity)
-
-    def project_cut_edges(self, bodies):
-        for body in bodies:
-            self.sketch.projectCutEdges(body)
-
-    def offset(self, profiles, dist):
-        tmp = [
-            (
-                to_collection(map(lambda pc: pc.sketchEntity, p.profileLoops[0].profileCurves)),
-                p.areaProperties().centroid,
-            )
-            for p in profiles
-        ]
-        for curves, point in tmp:
-            self.sketch.offset(curves, point, dist)
-
-
-class ProfileHelper:
-
-    def __init__(self, profile: Profile):
-        self.profile = profile
-
-    @property
-    def entities(self):
-        entities = []
-        for loop in self.profile.profileLoops:
-            if not loop:
-                continue
-            for curve in loop.profileCurves:
-                entities.append(curve.sketchEntity)
-        return entities
-
-    @property
-    def sorted_points(self) -> List[SketchPoint]:
-        points = []
-        def add(p):
-            if p not in points:
-                points.append(p)
-        for entity in self.entities:
-            if entity.objectType.endswith("::SketchPoint"):
-                add(entity)
-            elif entity.objectType.endswith("::SketchLine") or entity.objectType.endswith("::SketchArc"):
-                add(entity.startSketchPoint)
-                add(entity.endSketchPoint)
-            elif entity.objectType.endswith("::SketchCircle"):
-                add(entity.centerSketchPoint)
-        return sorted(points, key=lambda p: (p.geometry.z, p.geometry.y, p.geometry.x))
 
 class ExtrudeHelper:
     @classmethod
@@ -172,7 +253,7 @@ class ExtrudeHelper:
         return cls(extrude) if isinstance(extrude, ExtrudeFeature) else None
 
     def __init__(self, extrude: ExtrudeFeature):
-        self.extrude = extrude
+        self.extrude = trace(extrude)
 
     @property
     def name(self) -> str:
@@ -188,16 +269,17 @@ class ExtrudeHelper:
 
     @property
     def sorted_bodies(self):
-        def body_key(b: BRepBody):
-            p = b.physicalProperties.centerOfMass
-            return (p.z, p.y, p.x)
-
-        return sorted(self.bodies, key=body_key)
+        # bounding box centers order the split halves the same way as their
+        # centers of mass without a mass-property evaluation per body
+        return [i.body for i in sorted(map(body_info, self.bodies), key=lambda i: i.center[::-1])]
 
 
 class BodyHelper:
+    # entityToken -> (revisionId, [(face, normal)]), shared by every helper of the same body
+    normal_index = {}
+
     def __init__(self, body: BRepBody):
-        self.body = body
+        self.body = trace(body)
 
     @property
     def faces(self) -> BRepFaces:
@@ -207,21 +289,37 @@ class BodyHelper:
     def sorted_faces(self):
         return sorted(self.faces, key=lambda f: (f.centroid.z, f.centroid.y, f.centroid.x))
 
+    @property
+    def face_normals(self):
+        token, revision = self.body.entityToken, self.body.revisionId
+        cached = self.normal_index.get(token)
+        if cached is None or cached[0] != revision:
+            param = Point2D.create(0, 0)
+            normals = []
+            for f in self.faces:
+                s, n = f.evaluator.getNormalAtParameter(param)
+                normals.append((f, xyz(n)))
+            cached = self.normal_index[token] = (revision, normals)
+        return cached[1]
+
     def closest_face(self, vector: Vector) -> BRepFace:
-        v = Vector3D.create(vector.dx, vector.dy, vector.dz)
-        angle, face = float("inf"), None
-        for f in self.faces:
-            s, n = f.evaluator.getNormalAtParameter(Point2D.create(0, 0))
-            a = n.angleTo(v)
-            if a < angle:
-                angle = a
+        # normals are unit vectors, so the smallest angle is the largest dot product
+        dot, face = float("-inf"), None
+        for f, (x, y, z) in self.face_normals:
+            d = x * vector.dx + y * vector.dy + z * vector.dz
+            if d > dot:
+                dot = d
                 face = f
         return face
 
 
 class ComponentHelper:
+    # kinds of named entities main() looks up, indexed by name on first lookup
+    KINDS = ("base", "sketch", "plane", "extrude", "fillet", "combine", "body")
+
     def __init__(self, component: Component):
-        self.component = component
+        self.component = trace(component)
+        self._index = None
 
     @property
     def planes(self) -> ConstructionPlanes:
@@ -255,6 +353,78 @@ class ComponentHelper:
     def combines(self) -> CombineFeatures:
         return self.component.features.combineFeatures
 
+    @property
+    def base_features(self) -> BaseFeatures:
+        return self.component.features.baseFeatures
+
+    def collection(self, kind: str):
+        return {
+            "body": self.bodies,
+            "base": self.base_features,
+            "sketch": self.sketches,
+            "plane": self.planes,
+            "extrude": self.extrudes,
+            "fillet": self.fillets,
+            "combine": self.combines,
+        }[kind]
+
+    def scan(self, kind: str) -> dict:
+        names = {}
+        for entity in self.collection(kind):
+            names.setdefault(entity.name, entity)
+        return names
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            self._index = {kind: self.scan(kind) for kind in self.KINDS}
+        return self._index
+
+    def reindex(self, kind: str = None):
+        # after operations that consume or delete entities behind the helper's back
+        if self._index is None:
+            return
+        if kind is None:
+            self._index = None
+        else:
+            self._index[kind] = self.scan(kind)
+
+    def find(self, kind: str, name: str):
+        return self.index[kind].get(name)
+
+    def prefixed(self, kind: str, prefix: str) -> list:
+        return [e for n, e in sorted(self.index[kind].items()) if n.startswith(prefix)]
+
+    def name(self, kind: str, entity, name: str):
+        previous = entity.name
+        entity.name = name
+        if self._index is not None:
+            # a renamed entity must not stay findable under its old name
+            if previous != name:
+                self._index[kind].pop(previous, None)
+            self._index[kind][name] = entity
+        return entity
+
+    def child(self, name: str) -> Component:
+        for occurrence in self.component.occurrences:
+            if occurrence.component.name == name:
+                return occurrence.component
+
+    def add_child(self, name: str, offset: Vector = Vector()) -> Component:
+        transform = Matrix3D.create()
+        transform.translation = Vector3D.create(offset.dx, offset.dy, offset.dz)
+        occurrence = self.component.occurrences.addNewComponent(transform)
+        occurrence.component.name = name
+        return occurrence.component
+
+    def edges_at(self, point: Point, tolerance: float = SketchHelper.SNAP) -> List[BRepEdge]:
+        return list(self.component.findBRepUsingPoint(
+            Point3D.create(point.x, point.y, point.z),
+            BRepEntityTypes.BRepEdgeEntityType,
+            tolerance,
+            False,
+        ))
+
     def offset_plane(self, plane: ConstructionPlane, offset: float):
         pla_input = self.planes.createInput()
         pla_input.setByOffset(plane, ValueInput.createByReal(offset))
@@ -282,7 +452,7 @@ class ComponentHelper:
         ext_input = self.extrudes.createInput(to_collection(profiles), operation)
         extent = None
         if to_entity:
-            extent = ToEntityExtentDefinition.create(to_entity, False, ValueInput.createByReal(offset))
+            extent = ToEntityExtentDefinition.create(unwrap(to_entity), False, ValueInput.createByReal(offset))
         elif distance:
             extent = DistanceExtentDefinition.create(ValueInput.createByReal(distance))
         ext_input.setOneSideExtent(extent, direction or ExtentDirections.PositiveExtentDirection)
@@ -303,17 +473,133 @@ class ComponentHelper:
             operation,
         )
 
+    @property
+    def is_direct(self) -> bool:
+        return self.component.parentDesign.designType == DesignTypes.DirectDesignType
+
+    @contextmanager
+    def direct_modeling(self, enabled: bool = True):
+        # history capture off for the duration, restored afterwards
+        design = self.component.parentDesign
+        design_type = design.designType
+        if enabled:
+            design.designType = DesignTypes.DirectDesignType
+        try:
+            yield self
+        finally:
+            if design.designType != design_type:
+                design.designType = design_type
+
+    def add_base_body(self, body: BRepBody, name: str) -> BRepBody:
+        # temporary bodies need a base feature in parametric designs
+        if self.is_direct:
+            return self.bodies.add(unwrap(body))
+        base = self.base_features.add()
+        base.startEdit()
+        try:
+            self.bodies.add(unwrap(body), base)
+        finally:
+            base.finishEdit()
+        base.name = name
+        return base.bodies.item(0)
+
+    def add_combine(self, target: BRepBody, tools: List[BRepBody], operation, keep_tools: bool = False):
+        combine_input = self.combines.createInput(unwrap(target), to_collection(tools))
+        combine_input.operation = operation
+        combine_input.isKeepToolBodies = keep_tools
+        combine = self.combines.add(combine_input)
+        if not keep_tools:
+            self.reindex("body")
+        return combine
+
     def present_bodies(self, visible: callable):
-        for body in self.bodies:
-            body.isVisible = visible(body)
+        # visible is called with the body name
+        for name, body in self.index["body"].items():
+            body.isVisible = visible(name)
+
+
+class Stages:
+    # every named entity main() creates is a stage, keyed by "kind:name". its
+    # hash covers its own inputs plus the hashes of the stages it depends on,
+    # so a change invalidates the stage and everything downstream of it.
+    GROUP = "keyboard-case-generator"
+    ATTRIBUTE = "hash"
+
+    def __init__(self, component: ComponentHelper):
+        self.component = component
+        self.hashes = {}
+
+    def add(self, stage: str, inputs=(), *deps: str):
+        self.hashes[stage] = digest(stage, inputs, [self.hashes[d] for d in deps])
+
+    def drop(self, stage: str):
+        # a stage of the other build mode, whatever is left of it gets deleted
+        self.hashes[stage] = None
+
+    def entity(self, stage: str):
+        kind, name = stage.split(":", 1)
+        return self.component.find(kind, name)
+
+    @classmethod
+    def stored_hash(cls, entity, attribute: str = ATTRIBUTE):
+        attr = entity.attributes.itemByName(cls.GROUP, attribute)
+        return attr.value if attr else None
+
+    @classmethod
+    def store_hash(cls, entity, value: str, attribute: str = ATTRIBUTE):
+        entity.attributes.add(cls.GROUP, attribute, value)
+
+    def rollback(self):
+        # parametric designs only, a direct design has no timeline to order the
+        # deletions by and needs main.clear() instead
+        stale = []
+        for stage, h in self.hashes.items():
+            entity = self.entity(stage)
+            if entity and self.stored_hash(entity) != h:
+                stale.append(entity)
+        # delete from the end of the timeline so nothing references a deleted entity
+        for entity in sorted(stale, key=lambda e: e.timelineObject.index, reverse=True):
+            entity.deleteMe()
+        if stale:
+            self.component.reindex()
+        return len(stale)
+
+    def stamp(self):
+        for stage, h in self.hashes.items():
+            if h is None:
+                continue
+            entity = self.entity(stage)
+            if entity and self.stored_hash(entity) != h:
+                self.store_hash(entity, h)
+
+
+def box_body(boxes, transform: Matrix3D = None, tick=None) -> BRepBody:
+    # union of (rect, z1, z2, angle) boxes built in memory, no timeline features
+    # involved, each rect turned counterclockwise about its center by angle
+    temp = TemporaryBRepManager.get()
+    body = None
+    for i, (rect, z1, z2, a) in enumerate(boxes):
+        if tick:
+            tick(i + 1, len(boxes))
+        box = temp.createBox(OrientedBoundingBox3D.create(
+            Point3D.create(rect.rx, rect.ry, (z1 + z2) / 2),
+            Vector3D.create(cos(a), sin(a), 0),
+            Vector3D.create(-sin(a), cos(a), 0),
+            rect.w,
+            rect.h,
+            z2 - z1,
+        ))
+        if body is None:
+            body = box
+        else:
+            temp.booleanOperation(body, box, BooleanTypes.UnionBooleanType)
+    if body is not None and transform is not None:
+        temp.transform(body, unwrap(transform))
+    return body
 
 
 def to_collection(entities):
     coll = ObjectCollection.create()
     for entity in entities:
-        coll.add(entity)
+        coll.add(unwrap(entity))
     return coll
-
-
-def pick(points, indexes):
-    return [points[i] for i in indexes]
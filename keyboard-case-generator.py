@@ -3,13 +3,25 @@
 
 import adsk.core, adsk.fusion, adsk.cam, traceback
 
+# cut the key holes with one in-memory tool body, one combine per case, instead of
+# sketching every hole. the key hole stages then leave no editable sketches behind.
+FAST = False
+# build without timeline history, fusion evaluates every feature once instead of
+# recomputing everything downstream of it. leave off to keep an editable timeline.
+DIRECT = False
+# show the per stage time, api calls and peak memory after a build and write
+# them to <layout>.stats.json.
+SUMMARY = False
+# trace every api call the helpers make into <layout>.trace.json and .folded.
+PROFILE = False
+
 
 def run(context):
     try:
         app = adsk.core.Application.get()
         ui = app.userInterface
         from .main import main
-        main(app)
+        main(app, summary=SUMMARY, profile=PROFILE, fast=FAST, direct=DIRECT)
     except:
         if ui:
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
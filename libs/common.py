@@ -1,9 +1,20 @@
-from dataclasses import dataclass, field
-from typing import List, Iterable
+from array import array
+from math import cos, sin
+from dataclasses import dataclass, field, fields
+from typing import List, Iterable, Sequence
 from collections import namedtuple
 from .config import *
 
 
+def slotted(cls):
+    # rebuild a dataclass with __slots__ (dataclass(slots=True) needs python 3.10)
+    names = tuple(f.name for f in fields(cls))
+    body = {k: v for k, v in cls.__dict__.items() if k not in names + ("__dict__", "__weakref__")}
+    body["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, body)
+
+
+@slotted
 @dataclass
 class Vector:
     dx: float = 0
@@ -11,6 +22,7 @@ class Vector:
     dz: float = 0
 
 
+@slotted
 @dataclass
 class Point:
     x: float = 0
@@ -27,6 +39,7 @@ class Point:
         return f"({self.x:.2f}, {self.y:.2f}, {self.z:.2f})"
 
 
+@slotted
 @dataclass
 class Rect:
     p1: Point
@@ -74,37 +87,99 @@ class Rect:
         return Rect(self.p1.mirror_y(), self.p2.mirror_y())
 
 
-@dataclass
 class Polygon:
+    # vertices live in one flat x, y, z buffer, the bounding rect is computed on first use
     RECT = 1
     POLYGON = 2
 
-    points: List[Point]
-    rect: Rect
+    __slots__ = ("coords", "_rect", "_points")
+
+    def __init__(self, points: Iterable[Point] = (), rect: Rect = None, coords: array = None):
+        if coords is None:
+            coords = array("d", [v for p in points for v in (p.x, p.y, p.z)])
+        self.coords = coords
+        self._rect = rect
+        self._points = None
 
-    def __init__(self, points: List[Point], rect: Rect = None):
-        self.points = points
-        self.rect = rect
-        if not rect:
-            x1, y1, x2, y2 = float("inf"), float("-inf"), float("-inf"), float("inf")
-            for p in points:
-                x1 = p.x if p.x < x1 else x1
-                x2 = p.x if p.x > x2 else x2
-                y1 = p.y if p.y > y1 else y1
-                y2 = p.y if p.y < y2 else y2
-            self.rect = Rect(Point(x1, y1), Point(x2, y2))
+    @property
+    def points(self) -> List[Point]:
+        if self._points is None:
+            c = self.coords
+            self._points = [Point(c[i], c[i + 1], c[i + 2]) for i in range(0, len(c), 3)]
+        return self._points
+
+    @property
+    def rect(self) -> Rect:
+        if self._rect is None:
+            xs, ys = self.coords[0::3], self.coords[1::3]
+            self._rect = Rect(Point(min(xs), max(ys)), Point(max(xs), min(ys)))
+        return self._rect
 
     @property
     def shape(self) -> int:
-        return self.RECT if len(self.points) == 2 else self.POLYGON
+        return self.RECT if len(self.coords) == 6 else self.POLYGON
+
+    def vertices(self) -> List[Point]:
+        if self.shape == self.RECT:
+            r = Rect(*self.points)
+            return [r.tl, r.tr, r.br, r.bl]
+        return self.points
+
+    def copy(self):
+        return Polygon(rect=self._rect, coords=array("d", self.coords))
 
     def translate(self, v: Vector):
-        return Polygon([p.translate(v) for p in self.points], self.rect.translate(v))
+        return self.copy().translate_inplace(v)
 
     def mirror_y(self):
-        return Polygon([p.mirror_y() for p in self.points], self.rect.mirror_y())
+        return self.copy().mirror_y_inplace()
+
+    def rotate(self, a: float):
+        # counterclockwise about the origin, a two point rect comes out as four
+        # points, the rect grows to the bounding box of the rotated rect
+        c, s = cos(a), sin(a)
+        source = Polygon(self.vertices()).coords if self.shape == self.RECT else self.coords
+        xs, ys = source[0::3], source[1::3]
+        coords = array("d", source)
+        coords[0::3] = array("d", [x * c - y * s for x, y in zip(xs, ys)])
+        coords[1::3] = array("d", [x * s + y * c for x, y in zip(xs, ys)])
+        r = self.rect
+        corners = [(p.x * c - p.y * s, p.x * s + p.y * c) for p in (r.tl, r.tr, r.br, r.bl)]
+        rect = Rect(
+            Point(min(x for x, _ in corners), max(y for _, y in corners)),
+            Point(max(x for x, _ in corners), min(y for _, y in corners)),
+        )
+        return Polygon(rect=rect, coords=coords)
+
+    def translate_inplace(self, v: Vector):
+        c = self.coords
+        for i, d in enumerate((v.dx, v.dy, v.dz)):
+            if d:
+                c[i::3] = array("d", [x + d for x in c[i::3]])
+        if self._rect is not None:
+            self._rect = self._rect.translate(v)
+        self._points = None
+        return self
+
+    def mirror_y_inplace(self):
+        self.coords[0::3] = array("d", [-x for x in self.coords[0::3]])
+        if self._rect is not None:
+            self._rect = self._rect.mirror_y()
+        self._points = None
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, Polygon):
+            return NotImplemented
+        return self.coords == other.coords and self.rect == other.rect
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Polygon(points={self.points!r}, rect={self.rect!r})"
 
 
+@slotted
 @dataclass
 class Key:
     text: str
@@ -115,9 +190,169 @@ class Key:
         return Key(self.text, self.rect.translate(v), self.hole.translate(v))
 
 
+Run = namedtuple("Run", "start count pitch")
+
+
+class KeyArray:
+    # column store of the keys, one row per key, Key objects are only built on access.
+    # angle is the counterclockwise rotation of a key about its center, in radians
+
+    def __init__(self, names: List[str], templates: List[Polygon], texts=None, cx=None, cy=None, w=None, h=None, template=None, angle=None, housings=None):
+        self.names = names
+        self.templates = templates
+        # separate stabilizer cutouts per template, in template coordinates
+        self.housings = [[] for _ in templates] if housings is None else housings
+        self.texts = [] if texts is None else texts
+        self.cx = array("d") if cx is None else cx
+        self.cy = array("d") if cy is None else cy
+        self.w = array("d") if w is None else w
+        self.h = array("d") if h is None else h
+        self.template = array("B") if template is None else template
+        self.angle = array("d") if angle is None else angle
+        self._keys = {}
+        self._oriented = {}
+
+    def append(self, text: str, rx: float, ry: float, w: float, h: float, template: int, angle: float = 0):
+        self.texts.append(text)
+        self.cx.append(rx)
+        self.cy.append(ry)
+        self.w.append(w)
+        self.h.append(h)
+        self.template.append(template)
+        self.angle.append(angle)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, i: int) -> Key:
+        i = range(len(self))[i]
+        key = self._keys.get(i)
+        if key is None:
+            key = self._keys[i] = Key(
+                text=self.texts[i],
+                rect=self.rect(i),
+                hole=self.hole(i),
+            )
+        return key
+
+    def oriented(self, i: int) -> Polygon:
+        # the template of key i turned by its angle, shared by every key of a rotation
+        # block so each block rotates a template once
+        t, a = self.template[i], self.angle[i]
+        if not a:
+            return self.templates[t]
+        polygon = self._oriented.get((t, a))
+        if polygon is None:
+            polygon = self._oriented[(t, a)] = self.templates[t].rotate(a)
+        return polygon
+
+    def place(self, i: int, p: Point) -> Point:
+        # template coordinates to layout coordinates of key i
+        a = self.angle[i]
+        if not a:
+            return Point(self.cx[i] + p.x, self.cy[i] + p.y, p.z)
+        c, s = cos(a), sin(a)
+        return Point(self.cx[i] + p.x * c - p.y * s, self.cy[i] + p.x * s + p.y * c, p.z)
+
+    def hole(self, i: int) -> Polygon:
+        return self.oriented(i).translate(Vector(self.cx[i], self.cy[i]))
+
+    def cutouts(self, i: int) -> List[Polygon]:
+        # the hole of key i followed by its separate stabilizer housings
+        a, v = self.angle[i], Vector(self.cx[i], self.cy[i])
+        return [self.hole(i)] + [(h.rotate(a) if a else h).translate(v) for h in self.housings[self.template[i]]]
+
+    def clearance(self, i: int, margin: float = 0) -> Polygon:
+        # the template rect of key i grown by margin, turned with the key
+        r = self.templates[self.template[i]].rect.offset(margin)
+        polygon = Polygon([r.p1, r.p2], r)
+        if self.angle[i]:
+            polygon = polygon.rotate(self.angle[i])
+        return polygon.translate(Vector(self.cx[i], self.cy[i]))
+
+    def extents(self, i: int) -> tuple:
+        # half width and half height of the bounding box of the turned key rect
+        c, s = abs(cos(self.angle[i])), abs(sin(self.angle[i]))
+        w, h = self.w[i], self.h[i]
+        return (w * c + h * s) / 2, (w * s + h * c) / 2
+
+    def rect(self, i: int) -> Rect:
+        dx, dy = self.extents(i)
+        x1, y1, x2, y2 = rxry_to_xyxy(self.cx[i], self.cy[i], 2 * dx, 2 * dy)
+        return Rect(Point(x1, y1), Point(x2, y2))
+
+    def bounds(self) -> Rect:
+        # union of the key rects, turned keys count with their bounding boxes
+        if not len(self):
+            return Rect(Point(), Point())
+        extents = [self.extents(i) for i in range(len(self))]
+        return Rect(
+            Point(
+                min(x - dx for x, (dx, _) in zip(self.cx, extents)),
+                max(y + dy for y, (_, dy) in zip(self.cy, extents)),
+            ),
+            Point(
+                max(x + dx for x, (dx, _) in zip(self.cx, extents)),
+                min(y - dy for y, (_, dy) in zip(self.cy, extents)),
+            ),
+        )
+
+    def translate_inplace(self, v: Vector):
+        self.cx = array("d", [x + v.dx for x in self.cx])
+        self.cy = array("d", [y + v.dy for y in self.cy])
+        self._keys = {}
+        return self
+
+    def translate(self, v: Vector):
+        return KeyArray(
+            self.names,
+            self.templates,
+            self.texts,
+            array("d", [x + v.dx for x in self.cx]),
+            array("d", [y + v.dy for y in self.cy]),
+            self.w,
+            self.h,
+            self.template,
+            self.angle,
+            self.housings,
+        )
+
+    def runs(self, min_count: int = 2, tolerance: float = 1e-9) -> List["Run"]:
+        # consecutive keys of one row sharing a template and an angle at a constant
+        # x pitch, runs shorter than min_count come out as single keys
+        result = []
+        i, l = 0, len(self)
+        while i < l:
+            j = i + 1
+            pitch = self.cx[j] - self.cx[i] if j < l else 0
+            while (
+                j < l
+                and self.template[j] == self.template[i]
+                and self.angle[j] == self.angle[i]
+                and abs(self.cy[j] - self.cy[i]) < tolerance
+                and abs(self.cx[j] - self.cx[j - 1] - pitch) < tolerance
+            ):
+                j += 1
+            if j - i < min_count:
+                j = i + 1
+            result.append(Run(i, j - i, pitch if j - i > 1 else 0))
+            i = j
+        return result
+
+    def by_template(self) -> dict:
+        # key indices per template name, in key order
+        groups = {}
+        for i, t in enumerate(self.template):
+            groups.setdefault(self.names[t], array("L")).append(i)
+        return groups
+
+
 @dataclass
 class Layout:
-    keys: List[Key] = field(repr=False)
+    keys: Sequence[Key] = field(repr=False)
     rect: Rect
     left: Polygon
     right: Polygon
@@ -126,7 +361,7 @@ class Layout:
 
     def translate(self, v: Vector):
         return Layout(
-            keys=[k.translate(v) for k in self.keys],
+            keys=self.keys.translate(v) if isinstance(self.keys, KeyArray) else [k.translate(v) for k in self.keys],
             rect=self.rect.translate(v),
             left=self.left.translate(v),
             right=self.right.translate(v),
@@ -134,6 +369,16 @@ class Layout:
             author=self.author,
         )
 
+    def translate_inplace(self, v: Vector):
+        if isinstance(self.keys, KeyArray):
+            self.keys.translate_inplace(v)
+        else:
+            self.keys = [k.translate(v) for k in self.keys]
+        self.rect = self.rect.translate(v)
+        self.left.translate_inplace(v)
+        self.right.translate_inplace(v)
+        return self
+
 
 def rxry_to_xyxy(rx, ry, w, h):
     return rx - w / 2, ry + h / 2, rx + w / 2, ry - h / 2
@@ -144,17 +389,18 @@ def fold_points_y(points: List[Point]):
 
 
 def offset_points(points, dx):
-    result = [points[0].translate(Vector(dx=dx))]
+    p = points[0]
+    result = [Point(p.x + dx, p.y, p.z)]
     for i in range(0, len(points) - 2, 2):
-        p1, p2, p3 = points[i:i+3]
+        p1, p2, p3 = points[i], points[i + 1], points[i + 2]
         dy = 0
         if p1.x == p2.x:
-            dy=-dx if (p3.x - p2.x) < 0 else dx
-        v = Vector(dx, dy)
-        result.append(p2.translate(v))
-        result.append(p3.translate(v))
+            dy = -dx if (p3.x - p2.x) < 0 else dx
+        result.append(Point(p2.x + dx, p2.y + dy, p2.z))
+        result.append(Point(p3.x + dx, p3.y + dy, p3.z))
     if len(points) % 2 == 0:
-        result.append(points[-1].translate(Vector(dx=dx)))
+        p = points[-1]
+        result.append(Point(p.x + dx, p.y, p.z))
     return result
 
 
@@ -1,54 +1,75 @@
+from dataclasses import dataclass, fields, replace
+from typing import Tuple
+
 MM = 0.1
-U = 19*MM
-HOLE_SIZE = 14.4*MM
-STB_HOLE_DX = 11.9*MM
-STB_HOLE_DY = 0.62*MM
-STB_HOLE_W = 7.1*MM
-STB_HOLD_H = 13.4*MM
-SIDE_NOTCH_DX = 15.66*MM
-SIDE_NOTCH_DY = 0.9*MM
-SIDE_NOTCH_W = 1*MM
-SIDE_NOTCH_H = 2.9*MM
-BOTT_NOTCH_DX = STB_HOLE_DX
-BOTT_NOTCH_DY = 7.37*MM
-BOTT_NOTCH_W = 3.1*MM
-BOTT_NOTCH_H = 1.3*MM
-FRONT_HEIGHT = 10*MM
-REAR_HEIGHT = 21*MM
-PANEL_PADDING = 6*MM
-PANEL_TOP_THICKNESS = 1.5*MM
-PANEL_BOTTOM_THICKNESS = 3*MM
-WALL_THICKNESS = 2*MM
-PLATE_GAP = 0.5*MM
-PLATE_RAISE = 1*MM
-PLATE_BOLT_DIST = 0.1*MM
-PLATE_THICKNESS = 2*MM
-HOLDER_THICKNESS = 3*MM
-HOLDER_HEIGHT = 3*MM
-HOLDER_DIST = 30*MM
-PROMICRO_W = 18.4*MM
-PROMICRO_H = 34*MM
-PROMICRO_T = 2*MM
-PROMICRO_Y = 1.5*MM
-USB_L = 2*MM
-USB_H = 3.1*MM
-USB_W = 8.1*MM
-TRRS_H = 12*MM
-TRRS_W = 6.4*MM
-TRRS_T = 6*MM
-TRRS_L = 2*MM
-TRRS_RADIUS = 3*MM
-SPLIT_KEYS = [
-    (1, 7),
-    (2, 6),
-    (3, 6),
-    (4, 6),
-]
-SPLIT_GAP = 1*MM
-# SPLIT_WALL_THICKNESS = 1*MM
-CORNER_RADIUS = 4*MM
-BOLT_OUTER_RADIUS = 3*MM
-# BOLT_HEIGHT = 4*MM
-BOLT_HOLE_RADIUS = 1.0*MM
-PLATE_HOLE_RADIUS = 1.3*MM
-SWITCH_CLEARANCE = 5*MM
\ No newline at end of file
+
+
+@dataclass(frozen=True)
+class Config:
+    U: float = 19*MM
+    SWITCH: str = "mx"  # mx, choc or alps, see libs/switches.py
+    HOLE_SIZE: float = 14.4*MM
+    CHOC_HOLE_SIZE: float = 13.8*MM
+    ALPS_HOLE_W: float = 15.5*MM
+    ALPS_HOLE_H: float = 12.8*MM
+    STB_HOLE_DX: float = 11.9*MM
+    STB_HOLE_DY: float = 0.62*MM
+    STB_HOLE_W: float = 7.1*MM
+    STB_HOLD_H: float = 13.4*MM
+    SIDE_NOTCH_DX: float = 15.66*MM
+    SIDE_NOTCH_DY: float = 0.9*MM
+    SIDE_NOTCH_W: float = 1*MM
+    SIDE_NOTCH_H: float = 2.9*MM
+    BOTT_NOTCH_DX: float = STB_HOLE_DX
+    BOTT_NOTCH_DY: float = 7.37*MM
+    BOTT_NOTCH_W: float = 3.1*MM
+    BOTT_NOTCH_H: float = 1.3*MM
+    FRONT_HEIGHT: float = 10*MM
+    REAR_HEIGHT: float = 21*MM
+    PANEL_PADDING: float = 6.5*MM
+    PANEL_TOP_THICKNESS: float = 1.5*MM
+    PANEL_BOTTOM_THICKNESS: float = 3*MM
+    WALL_THICKNESS: float = 2*MM
+    PLATE_GAP: float = 0.5*MM
+    PLATE_RAISE: float = 1*MM
+    PLATE_BOLT_DIST: float = 0.1*MM
+    PLATE_THICKNESS: float = 2*MM
+    HOLDER_THICKNESS: float = 3*MM
+    HOLDER_HEIGHT: float = 3*MM
+    HOLDER_DIST: float = 30*MM
+    PROMICRO_W: float = 18.4*MM
+    PROMICRO_H: float = 34*MM
+    PROMICRO_T: float = 2*MM
+    PROMICRO_Y: float = 1.5*MM
+    USB_L: float = 2*MM
+    USB_H: float = 3.1*MM
+    USB_W: float = 8.1*MM
+    TRRS_H: float = 12*MM
+    TRRS_W: float = 6.4*MM
+    TRRS_T: float = 6*MM
+    TRRS_L: float = 2*MM
+    TRRS_RADIUS: float = 3*MM
+    SPLIT_KEYS: Tuple[Tuple[int, int], ...] = (
+        (1, 7),
+        (2, 6),
+        (3, 6),
+        (4, 6),
+    )
+    SPLIT_GAP: float = 1*MM
+    # SPLIT_WALL_THICKNESS = 1*MM
+    CORNER_RADIUS: float = 4*MM
+    BOLT_OUTER_RADIUS: float = 3*MM
+    # BOLT_HEIGHT = 4*MM
+    BOLT_HOLE_RADIUS: float = 1.0*MM
+    PLATE_HOLE_RADIUS: float = 1.3*MM
+    SWITCH_CLEARANCE: float = 5*MM
+
+    def replace(self, **changes) -> "Config":
+        return replace(self, **changes)
+
+
+DEFAULT = Config()
+
+# module level names of the defaults, for `from .config import *`
+globals().update({f.name: getattr(DEFAULT, f.name) for f in fields(Config)})
+__all__ = ["MM", "Config", "DEFAULT"] + [f.name for f in fields(Config)]
@@ -0,0 +1,29 @@
+import hashlib
+from array import array
+from dataclasses import fields, is_dataclass
+from .common import *
+from .config import *
+
+
+def normalize(value):
+    if isinstance(value, KeyArray):
+        return normalize([value.names, value.templates, value.texts, value.cx, value.cy, value.w, value.h, value.template, value.angle, value.housings])
+    if isinstance(value, Polygon):
+        return ("Polygon", normalize(value.coords), normalize(value.rect))
+    if is_dataclass(value):
+        return (type(value).__name__, *(normalize(getattr(value, f.name)) for f in fields(value)))
+    if isinstance(value, (list, tuple, array, memoryview)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, float):
+        return value.hex()
+    return value
+
+
+def digest(*values) -> str:
+    return hashlib.sha1(repr(normalize(values)).encode("utf-8")).hexdigest()
+
+
+def config_items(config: Config = DEFAULT) -> tuple:
+    return tuple((f.name, getattr(config, f.name)) for f in fields(config))
@@ -0,0 +1,90 @@
+from .common import *
+from .config import *
+from . import geometry, promicro, trrs
+
+# flat cut files for laser cutting, entities are written one by one as they are
+# generated. the plate and the panel are separate parts, each in its own frame:
+# plate, screws and holders in plate coordinates (the projected footprint), the
+# panel outline and the key holes in panel coordinates. every file holds one part,
+# each kind of entity on its own layer.
+
+PARTS = ("plate", "panel")
+LAYER_COLORS = dict(plate=1, panel=2, keys=5, screws=3, holders=6)
+
+
+def plate_entities(layout: Layout, config: Config = DEFAULT):
+    for outline in geometry.plate_outlines(layout, config):
+        yield "plate", "polyline", outline.vertices()
+    for center in geometry.bolt_centers(layout, config):
+        yield "screws", "circle", (center, config.PLATE_HOLE_RADIUS)
+    v1, v2, v3, v4 = geometry.holder_anchors(layout, config)
+    for p in promicro.get_promicro_holder(config):
+        yield "holders", "polyline", p.translate(v1).vertices()
+        yield "holders", "polyline", p.translate(v4).vertices()
+    for p in trrs.get_trrs_holder(config):
+        yield "holders", "polyline", p.translate(v2).vertices()
+        yield "holders", "polyline", p.translate(v3).vertices()
+
+
+def panel_entities(layout: Layout, config: Config = DEFAULT):
+    for half in (layout.left, layout.right):
+        yield "panel", "polyline", half.vertices()
+    for i in range(len(layout.keys)):
+        for polygon in layout.keys.cutouts(i):
+            yield "keys", "polyline", polygon.vertices()
+
+
+def cut_entities(layout: Layout, part: str = "plate", config: Config = DEFAULT):
+    if part not in PARTS:
+        raise ValueError(f"unknown part {part!r}, expected one of {', '.join(PARTS)}")
+    return (plate_entities if part == "plate" else panel_entities)(layout, config)
+
+
+def write_dxf(file_path: str, layout: Layout, part: str = "plate", scale: float = 1 / MM, config: Config = DEFAULT):
+    def group(f, code, value):
+        f.write(f"{code}\n{value}\n")
+
+    entities = cut_entities(layout, part, config)
+    with open(file_path, "w", encoding="ascii") as f:
+        for code, value in ((0, "SECTION"), (2, "HEADER"), (9, "$ACADVER"), (1, "AC1009"), (9, "$INSUNITS"), (70, 4), (0, "ENDSEC")):
+            group(f, code, value)
+        group(f, 0, "SECTION")
+        group(f, 2, "ENTITIES")
+        for layer, kind, data in entities:
+            if kind == "circle":
+                center, radius = data
+                for code, value in ((0, "CIRCLE"), (8, layer), (62, LAYER_COLORS[layer]), (10, center.x * scale), (20, center.y * scale), (40, radius * scale)):
+                    group(f, code, value)
+                continue
+            for code, value in ((0, "POLYLINE"), (8, layer), (62, LAYER_COLORS[layer]), (66, 1), (10, 0), (20, 0), (30, 0), (70, 1)):
+                group(f, code, value)
+            for p in data:
+                for code, value in ((0, "VERTEX"), (8, layer), (10, p.x * scale), (20, p.y * scale)):
+                    group(f, code, value)
+            group(f, 0, "SEQEND")
+            group(f, 8, layer)
+        group(f, 0, "ENDSEC")
+        group(f, 0, "EOF")
+
+
+def write_svg(file_path: str, layout: Layout, part: str = "plate", scale: float = 1 / MM, margin: float = None, config: Config = DEFAULT):
+    margin = 2 * config.WALL_THICKNESS if margin is None else margin
+    rect = layout.rect.offset(margin)
+    x, y, w, h = rect.p1.x * scale, -rect.p1.y * scale, rect.w * scale, rect.h * scale
+    entities = cut_entities(layout, part, config)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{w:.3f}mm" height="{h:.3f}mm" '
+            f'viewBox="{x:.3f} {y:.3f} {w:.3f} {h:.3f}">\n'
+            '<style>path,circle{fill:none;stroke-width:0.1}'
+            '.plate{stroke:red}.panel{stroke:orange}.keys{stroke:blue}.screws{stroke:green}.holders{stroke:magenta}</style>\n'
+        )
+        # svg y points down
+        for layer, kind, data in entities:
+            if kind == "circle":
+                center, radius = data
+                f.write(f'<circle class="{layer}" cx="{center.x * scale:.3f}" cy="{-center.y * scale:.3f}" r="{radius * scale:.3f}"/>\n')
+                continue
+            d = " ".join(f"{p.x * scale:.3f},{-p.y * scale:.3f}" for p in data)
+            f.write(f'<path class="{layer}" d="M{d}Z"/>\n')
+        f.write("</svg>\n")
@@ -0,0 +1,182 @@
+from math import atan2, cos, sin, sqrt
+from .common import *
+from .config import *
+
+# headless counterpart of the fusion-side projection/offset steps in main:
+# everything here works on the sketch coordinates of the xy plane (cases,
+# wall, plate, bolts) or the panel plane (keys).
+
+
+def panel_plane_points(layout: Layout, config: Config = DEFAULT) -> List[Point]:
+    z = solve_intercept(layout.rect.p1.y, config.FRONT_HEIGHT, layout.rect.p2.y, config.REAR_HEIGHT)
+    return [Point(0, 0, z), Point(5, 0, z), Point(0, 5, config.REAR_HEIGHT)]
+
+
+def panel_tilt(layout: Layout, config: Config = DEFAULT) -> float:
+    p1, _, p3 = panel_plane_points(layout, config)
+    return atan2(p3.z - p1.z, p3.y - p1.y)
+
+
+def signed_area(points: List[Point]) -> float:
+    l = len(points)
+    return sum(points[i].x * points[(i + 1) % l].y - points[(i + 1) % l].x * points[i].y for i in range(l)) / 2
+
+
+def dedupe_points(points: List[Point]) -> List[Point]:
+    result = []
+    for p in points:
+        if result and abs(result[-1].x - p.x) < 1e-9 and abs(result[-1].y - p.y) < 1e-9:
+            continue
+        result.append(p)
+    while len(result) > 1 and abs(result[0].x - result[-1].x) < 1e-9 and abs(result[0].y - result[-1].y) < 1e-9:
+        result.pop()
+    # drop collinear vertices so offsets don't produce degenerate miters
+    i = 0
+    while len(result) > 3 and i < len(result):
+        a, b, c = result[i - 1], result[i], result[(i + 1) % len(result)]
+        if abs((b.x - a.x) * (c.y - b.y) - (b.y - a.y) * (c.x - b.x)) < 1e-12:
+            result.pop(i)
+        else:
+            i += 1
+    return result
+
+
+def offset_polygon(polygon: Polygon, dist: float) -> Polygon:
+    # miter offset, positive dist grows the polygon
+    points = dedupe_points(polygon.vertices())
+    l = len(points)
+    sign = 1 if signed_area(points) > 0 else -1
+    normals = []
+    for i in range(l):
+        a, b = points[i], points[(i + 1) % l]
+        dx, dy = b.x - a.x, b.y - a.y
+        n = sqrt(dx * dx + dy * dy)
+        normals.append((sign * dy / n, -sign * dx / n))
+    result = []
+    for i in range(l):
+        (n1x, n1y), (n2x, n2y) = normals[i - 1], normals[i]
+        mx, my = n1x + n2x, n1y + n2y
+        k = dist / (1 + n1x * n2x + n1y * n2y)
+        result.append(Point(points[i].x + mx * k, points[i].y + my * k, points[i].z))
+    return Polygon(result)
+
+
+def sweep_y(polygon: Polygon, lo: float, hi: float) -> Polygon:
+    # minkowski sum of an orthogonal polygon, whose horizontal sections are
+    # single intervals, with the vertical segment [lo, hi]
+    points = polygon.vertices()
+    l = len(points)
+    edges = [(points[i], points[(i + 1) % l]) for i in range(l)]
+    edges = [(a.x, min(a.y, b.y), max(a.y, b.y)) for a, b in edges if a.x == b.x and a.y != b.y]
+    ys = sorted({p.y for p in points})
+    bands = []
+    for y1, y2 in zip(ys, ys[1:]):
+        m = (y1 + y2) / 2
+        xs = [x for x, e1, e2 in edges if e1 < m < e2]
+        bands.append((y1, y2, min(xs), max(xs)))
+    cuts = sorted({y + lo for y in ys} | {y + hi for y in ys})
+    result = []
+    for y1, y2 in zip(cuts, cuts[1:]):
+        w1, w2 = (y1 + y2) / 2 - hi, (y1 + y2) / 2 - lo
+        hits = [(x1, x2) for b1, b2, x1, x2 in bands if b1 < w2 and b2 > w1]
+        if not hits:
+            continue
+        x1, x2 = min(h[0] for h in hits), max(h[1] for h in hits)
+        if result and result[-1][2:] == (x1, x2) and result[-1][1] == y1:
+            result[-1] = (result[-1][0], y2, x1, x2)
+        else:
+            result.append((y1, y2, x1, x2))
+    right = [p for y1, y2, x1, x2 in reversed(result) for p in (Point(x2, y2), Point(x2, y1))]
+    left = [p for y1, y2, x1, x2 in result for p in (Point(x1, y1), Point(x1, y2))]
+    return Polygon(dedupe_points(right + left))
+
+
+def orthogonal_rects(polygon: Polygon) -> List[Rect]:
+    # split an orthogonal polygon into rects, band by band between its vertex ys,
+    # spans repeated by consecutive bands are merged into one taller rect
+    points = polygon.vertices()
+    l = len(points)
+    edges = [(points[i], points[(i + 1) % l]) for i in range(l)]
+    edges = [(a.x, min(a.y, b.y), max(a.y, b.y)) for a, b in edges if a.x == b.x and a.y != b.y]
+    ys = sorted({p.y for p in points})
+    rects, open_spans = [], {}
+    for y1, y2 in zip(ys, ys[1:]):
+        m = (y1 + y2) / 2
+        xs = sorted(x for x, e1, e2 in edges if e1 < m < e2)
+        spans = {}
+        for x1, x2 in zip(xs[::2], xs[1::2]):
+            i = open_spans.get((x1, x2))
+            if i is None:
+                i = len(rects)
+                rects.append(Rect(Point(x1, y2), Point(x2, y1)))
+            else:
+                rects[i] = Rect(Point(x1, y2), rects[i].p2)
+            spans[(x1, x2)] = i
+        open_spans = spans
+    return rects
+
+
+def case_outlines(layout: Layout, config: Config = DEFAULT) -> List[Polygon]:
+    # what projecting the tilted case bodies onto the xy plane yields
+    a = panel_tilt(layout, config)
+    c, s = cos(a), sin(a)
+    lo, hi = sorted([-config.PANEL_TOP_THICKNESS * s, config.PANEL_BOTTOM_THICKNESS * s])
+    return [
+        sweep_y(Polygon([Point(p.x, p.y * c) for p in half.vertices()]), lo, hi)
+        for half in (layout.left, layout.right)
+    ]
+
+
+def wall_outlines(layout: Layout, config: Config = DEFAULT) -> List[Polygon]:
+    # inner side of the wall, the wall itself stays within the case so the halves keep the split gap
+    return [offset_polygon(o, -config.WALL_THICKNESS) for o in case_outlines(layout, config)]
+
+
+def plate_outlines(layout: Layout, config: Config = DEFAULT) -> List[Polygon]:
+    return [offset_polygon(o, -config.WALL_THICKNESS - config.PLATE_GAP) for o in case_outlines(layout, config)]
+
+
+def bolt_centers(layout: Layout, config: Config = DEFAULT) -> List[Point]:
+    # circles tangent to the inner wall at the top and bottom corners of each half
+    centers = []
+    for outline in wall_outlines(layout, config):
+        points = outline.vertices()
+        l = len(points)
+        order = sorted(range(l), key=lambda i: (points[i].y, points[i].x))
+        for i in [order[0], order[1], order[-2], order[-1]]:
+            p, prev, succ = points[i], points[i - 1], points[(i + 1) % l]
+            dx = (prev.x - p.x) + (succ.x - p.x)
+            dy = (prev.y - p.y) + (succ.y - p.y)
+            centers.append(Point(
+                p.x + (config.BOLT_OUTER_RADIUS if dx > 0 else -config.BOLT_OUTER_RADIUS),
+                p.y + (config.BOLT_OUTER_RADIUS if dy > 0 else -config.BOLT_OUTER_RADIUS),
+            ))
+    return centers
+
+
+def fillet_corners(layout: Layout, config: Config = DEFAULT) -> List[Point]:
+    # floor corners of the wall ring along the outer left and right sides
+    x = abs(layout.rect.p1.x)
+    return [
+        Point(p.x, p.y, 0)
+        for outline in case_outlines(layout, config) + wall_outlines(layout, config)
+        for p in outline.vertices()
+        if abs(abs(p.x) - x) <= config.WALL_THICKNESS * 2
+    ]
+
+
+def holder_anchors(layout: Layout, config: Config = DEFAULT) -> List[Vector]:
+    # promicro sits next to the outer wall, trrs next to the split, on the rear edge of the plates
+    tops = []
+    for outline in plate_outlines(layout, config):
+        points = outline.vertices()
+        y = max(p.y for p in points)
+        xs = [p.x for p in points if abs(p.y - y) < 1e-9]
+        tops += [Point(min(xs), y), Point(max(xs), y)]
+    p1, p2, p3, p4 = sorted(tops, key=lambda p: p.x)
+    return [
+        Vector(dx=p1.x + config.HOLDER_DIST, dy=p1.y),
+        Vector(dx=p2.x - config.HOLDER_DIST, dy=p2.y),
+        Vector(dx=p3.x + config.HOLDER_DIST, dy=p3.y),
+        Vector(dx=p4.x - config.HOLDER_DIST, dy=p4.y),
+    ]
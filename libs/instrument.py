@@ -0,0 +1,72 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# extension modules behind the fusion api, calls into them are api round trips
+API_MODULES = ("adsk", "_core", "_fusion", "_cam")
+
+
+class Recorder:
+    # stage timings are always kept. api call counts and peak memory hook every
+    # python call and allocation, so they are only measured when instrument is on
+
+    def __init__(self, instrument: bool = False):
+        self.instrument = instrument
+        self.stages = []
+        self.api_calls = 0
+
+    def _profile(self, frame, event, arg):
+        # the builtin behind each swig wrapper, counting the wrapper's own python
+        # frame as well would count every round trip twice
+        if event == "c_call" and (getattr(arg, "__module__", None) or "").startswith(API_MODULES):
+            self.api_calls += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        if not self.instrument:
+            try:
+                yield
+            finally:
+                self.stages.append(dict(name=name, seconds=time.perf_counter() - started, api_calls=0, peak_bytes=0))
+            return
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        calls = self.api_calls
+        previous = sys.getprofile()
+        sys.setprofile(self._profile)
+        try:
+            yield
+        finally:
+            sys.setprofile(previous)
+            _, peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+            self.stages.append(dict(
+                name=name,
+                seconds=time.perf_counter() - started,
+                api_calls=self.api_calls - calls,
+                peak_bytes=peak,
+            ))
+
+    def report(self) -> dict:
+        return dict(
+            stages=self.stages,
+            seconds=sum(s["seconds"] for s in self.stages),
+            api_calls=sum(s["api_calls"] for s in self.stages),
+            peak_bytes=max((s["peak_bytes"] for s in self.stages), default=0),
+        )
+
+    def write(self, file_path: str):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<16}{'seconds':>10}{'api calls':>11}{'peak kb':>10}"]
+        for s in self.stages + [dict(self.report(), name="total")]:
+            lines.append(f"{s['name']:<16}{s['seconds']:>10.2f}{s['api_calls']:>11}{s['peak_bytes'] / 1024:>10.0f}")
+        return "\n".join(lines)
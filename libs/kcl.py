@@ -0,0 +1,177 @@
+import mmap
+import struct
+from array import array
+from .common import *
+from .config import *
+from .digest import digest, config_items
+from . import switches
+
+# compiled layout file (.kcl), what kle.from_json produces for one config in a
+# form that loads without parsing: a fixed header followed by 8 byte aligned
+# little endian blocks. the file is mapped and every block is copied out in one
+# piece, nothing keeps the file open (or locked, on windows) after loading.
+#
+#   header      magic, version, flags, config sha1, templates sha1, counts, layout rect
+#   templates   u32 coord count, 4 d rect, then the coords of every template
+#   keys        d cx, d cy, d w, d h, d angle, B template id
+#   split       d left coords, d right coords
+#   strings     u32 offsets, utf-8 blob: name, author, template names, key texts
+
+MAGIC = b"KCL\0"
+VERSION = 3
+HEADER = struct.Struct("<4sHH20s20sIIIII4d")
+HAS_NAME, HAS_AUTHOR = 1, 2
+
+
+class FormatError(ValueError):
+    pass
+
+
+def sidecar_path(source: str) -> str:
+    return source.rsplit(".", 1)[0] + ".kcl"
+
+
+def config_digest(config: Config = DEFAULT) -> bytes:
+    return bytes.fromhex(digest(config_items(config)))
+
+
+def templates_digest(config: Config = DEFAULT) -> bytes:
+    # the cutouts switches.py draws for the config, the config digest alone misses
+    # a change to the template code
+    return bytes.fromhex(digest(list(switches.templates(config).items()), list(switches.housings(config).items())))
+
+
+def pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def dump(layout: Layout, file_path: str, config: Config = DEFAULT):
+    keys = layout.keys
+    if not isinstance(keys, KeyArray):
+        raise FormatError("only KeyArray layouts can be compiled")
+    if layout.left.shape == Polygon.RECT or layout.right.shape == Polygon.RECT:
+        raise FormatError("split halves must be full polygons")
+    strings = [layout.name or "", layout.author or ""] + list(keys.names) + list(keys.texts)
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    blob = b"".join(encoded)
+    flags = (HAS_NAME if layout.name is not None else 0) | (HAS_AUTHOR if layout.author is not None else 0)
+    r = layout.rect
+    header = HEADER.pack(
+        MAGIC, VERSION, flags, config_digest(config), templates_digest(config),
+        len(keys), len(keys.templates), len(layout.left.coords), len(layout.right.coords), len(blob),
+        r.p1.x, r.p1.y, r.p2.x, r.p2.y,
+    )
+    rects = array("d", [v for t in keys.templates for v in (t.rect.p1.x, t.rect.p1.y, t.rect.p2.x, t.rect.p2.y)])
+    blocks = [
+        header,
+        array("I", [len(t.coords) for t in keys.templates]).tobytes(),
+        rects.tobytes(),
+        b"".join(t.coords.tobytes() for t in keys.templates),
+        array("d", keys.cx).tobytes(),
+        array("d", keys.cy).tobytes(),
+        array("d", keys.w).tobytes(),
+        array("d", keys.h).tobytes(),
+        array("d", keys.angle).tobytes(),
+        array("B", keys.template).tobytes(),
+        layout.left.coords.tobytes(),
+        layout.right.coords.tobytes(),
+        offsets.tobytes(),
+        blob,
+    ]
+    with open(file_path, "wb") as f:
+        for block in blocks:
+            f.write(pad(block))
+
+
+class Reader:
+    # walks the blocks of a mapped file, every block starts 8 byte aligned
+
+    def __init__(self, view: memoryview, offset: int):
+        self.view = view
+        self.offset = offset
+
+    def take(self, fmt: str, count: int) -> array:
+        size = struct.calcsize(fmt) * count
+        if self.offset + size > len(self.view):
+            raise FormatError("truncated file")
+        block = array(fmt)
+        block.frombytes(self.view[self.offset:self.offset + size])
+        self.offset += size + (-size % 8)
+        return block
+
+
+def read_header(view) -> tuple:
+    if len(view) < HEADER.size:
+        raise FormatError("truncated header")
+    header = HEADER.unpack_from(view)
+    if header[0] != MAGIC:
+        raise FormatError("not a compiled layout")
+    if header[1] != VERSION:
+        raise FormatError(f"format version {header[1]}, expected {VERSION}")
+    return header
+
+
+def header(file_path: str) -> dict:
+    with open(file_path, "rb") as f:
+        fields = read_header(f.read(HEADER.size))
+    _, version, flags, config, shapes, keys, templates, left, right, strings, x1, y1, x2, y2 = fields
+    return dict(
+        version=version,
+        flags=flags,
+        config=config.hex(),
+        shapes=shapes.hex(),
+        keys=keys,
+        templates=templates,
+        left=left // 3,
+        right=right // 3,
+        string_bytes=strings,
+        rect=(x1, y1, x2, y2),
+    )
+
+
+def load(file_path: str, config: Config = DEFAULT) -> Layout:
+    try:
+        return read(file_path, config)
+    except FormatError:
+        raise
+    except (ValueError, TypeError, struct.error) as e:
+        # empty files can not be mapped, damaged ones fail in the casts or decoding
+        raise FormatError(f"damaged file: {e}") from e
+
+
+def read(file_path: str, config: Config = DEFAULT) -> Layout:
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as view:
+        _, _, flags, stored, shapes, n, n_templates, n_left, n_right, n_blob, x1, y1, x2, y2 = read_header(view)
+        if stored != config_digest(config):
+            raise FormatError("compiled for a different config")
+        if shapes != templates_digest(config):
+            raise FormatError("compiled with different switch templates")
+        reader = Reader(view, HEADER.size + (-HEADER.size % 8))
+        counts = reader.take("I", n_templates)
+        rects = reader.take("d", 4 * n_templates)
+        coords = reader.take("d", sum(counts))
+        cx, cy, w, h, angle = (reader.take("d", n) for _ in range(5))
+        template = reader.take("B", n)
+        left, right = reader.take("d", n_left), reader.take("d", n_right)
+        offsets = reader.take("I", 3 + n_templates + n)
+        blob = reader.take("B", n_blob).tobytes()
+    strings = [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)]
+    templates, start = [], 0
+    for i, count in enumerate(counts):
+        a, b, c, d = rects[4 * i:4 * i + 4]
+        templates.append(Polygon(rect=Rect(Point(a, b), Point(c, d)), coords=coords[start:start + count]))
+        start += count
+    names = strings[2:2 + n_templates]
+    # housings are not stored, the templates digest above vouches for the registry
+    housings = switches.housings(config)
+    return Layout(
+        keys=KeyArray(names, templates, strings[2 + n_templates:], cx, cy, w, h, template, angle, [housings.get(name, []) for name in names]),
+        rect=Rect(Point(x1, y1), Point(x2, y2)),
+        left=Polygon(coords=left),
+        right=Polygon(coords=right),
+        name=strings[0] if flags & HAS_NAME else None,
+        author=strings[1] if flags & HAS_AUTHOR else None,
+    )
@@ -0,0 +1,199 @@
+import struct
+import zipfile
+from bisect import bisect_left, bisect_right
+from math import cos, pi, sin
+from .common import *
+from .config import *
+from . import geometry
+
+# plates straight from the layout: the plate outlines with the screw holes (and
+# optionally the key holes) removed, extruded by PLATE_THICKNESS and written as
+# binary stl or 3mf without going through fusion.
+
+CIRCLE_SEGMENTS = 32
+
+
+def circle(center: Point, radius: float, segments: int = CIRCLE_SEGMENTS) -> List[Point]:
+    return [
+        Point(center.x + radius * cos(2 * pi * i / segments), center.y + radius * sin(2 * pi * i / segments))
+        for i in range(segments)
+    ]
+
+
+def oriented(points: List[Point], ccw: bool) -> List[Point]:
+    return points if (geometry.signed_area(points) > 0) == ccw else points[::-1]
+
+
+def plate_rings(layout: Layout, key_holes: bool = False, config: Config = DEFAULT) -> List[List[Point]]:
+    # material on the left of every ring: outlines counter-clockwise, holes clockwise
+    rings = [oriented(geometry.dedupe_points(o.vertices()), True) for o in geometry.plate_outlines(layout, config)]
+    rings += [oriented(circle(c, config.PLATE_HOLE_RADIUS), False) for c in geometry.bolt_centers(layout, config)]
+    if key_holes:
+        # key holes live on the tilted panel, project them like the case outlines
+        c = cos(geometry.panel_tilt(layout, config))
+        for i in range(len(layout.keys)):
+            for polygon in layout.keys.cutouts(i):
+                rings.append(oriented([Point(p.x, p.y * c) for p in polygon.vertices()], False))
+    return rings
+
+
+def interpolate(a: Point, b: Point, x: float) -> float:
+    a, b = (a, b) if a.x < b.x else (b, a)
+    if x == a.x:
+        return a.y
+    if x == b.x:
+        return b.y
+    return a.y + (b.y - a.y) * (x - a.x) / (b.x - a.x)
+
+
+def zip_chains(left, right):
+    # triangulate the strip between two vertical chains, both running bottom to top
+    i = j = 0
+    while i < len(left) - 1 or j < len(right) - 1:
+        if j == len(right) - 1 or (i < len(left) - 1 and left[i + 1][1] <= right[j + 1][1]):
+            yield left[i], right[j], left[i + 1]
+            i += 1
+        else:
+            yield left[i], right[j], right[j + 1]
+            j += 1
+
+
+def exposed(spans, others):
+    # the parts of the sorted y spans not covered by the other sorted spans
+    for y1, y2 in spans:
+        for o1, o2 in others:
+            if o1 >= y2:
+                break
+            if o2 <= y1:
+                continue
+            if o1 > y1:
+                yield y1, o1
+            y1 = o2
+        if y1 < y2:
+            yield y1, y2
+
+
+def triangles(rings: List[List[Point]], thickness: float, z: float = 0):
+    # caps are split into trapezoids between consecutive vertex x positions, side
+    # walls and trapezoid sides are split at the same points so the mesh is watertight
+    edges = [(ring[i], ring[(i + 1) % len(ring)]) for ring in rings for i in range(len(ring))]
+    columns = {}
+    for ring in rings:
+        for p in ring:
+            columns.setdefault(p.x, []).append(p.y)
+    for ys in columns.values():
+        ys.sort()
+    xs = sorted(columns)
+    z1, z2 = z, z + thickness
+
+    def side(x, y1, y2):
+        ys = columns[x]
+        return [(x, y1)] + [(x, y) for y in ys[bisect_right(ys, y1):bisect_left(ys, y2)]] + [(x, y2)]
+
+    def wall(p, q):
+        yield p + (z1,), q + (z1,), q + (z2,)
+        yield p + (z1,), q + (z2,), p + (z2,)
+
+    edges.sort(key=lambda e: min(e[0].x, e[1].x))
+    active, next_edge, before = [], 0, []
+    for x1, x2 in zip(xs, xs[1:] + [None]):
+        after, spans = [], []
+        if x2 is not None:
+            active = [e for e in active if max(e[0].x, e[1].x) > x1]
+            while next_edge < len(edges) and min(edges[next_edge][0].x, edges[next_edge][1].x) <= x1:
+                e = edges[next_edge]
+                if max(e[0].x, e[1].x) > x1:
+                    active.append(e)
+                next_edge += 1
+            # material where the winding number is positive, so holes may cross the outline
+            m, winding = (x1 + x2) / 2, 0
+            for e in sorted(active, key=lambda e: interpolate(*e, m)):
+                inside = winding > 0
+                winding += 1 if e[0].x < e[1].x else -1
+                if winding > 0 and not inside:
+                    lower = e
+                elif inside and winding <= 0 and interpolate(*lower, m) < interpolate(*e, m):
+                    spans.append((lower, e))
+        for lower, upper in spans:
+            left = side(x1, interpolate(*lower, x1), interpolate(*upper, x1))
+            right = side(x2, interpolate(*lower, x2), interpolate(*upper, x2))
+            for p, q, r in zip_chains(left, right):
+                yield p + (z2,), q + (z2,), r + (z2,)
+                yield p + (z1,), r + (z1,), q + (z1,)
+            yield from wall(left[0], right[0])
+            yield from wall(right[-1], left[-1])
+            after.append((left[0][1], left[-1][1]))
+        # vertical walls where only one of the strips meeting at x1 has material
+        for y1, y2 in exposed(before, after):
+            points = side(x1, y1, y2)
+            for p, q in zip(points, points[1:]):
+                yield from wall(p, q)
+        for y1, y2 in exposed(after, before):
+            points = side(x1, y1, y2)
+            for p, q in zip(points, points[1:]):
+                yield from wall(q, p)
+        before = [(interpolate(*lower, x2), interpolate(*upper, x2)) for lower, upper in spans]
+
+
+def normal(t) -> tuple:
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = t
+    ux, uy, uz, vx, vy, vz = bx - ax, by - ay, bz - az, cx - ax, cy - ay, cz - az
+    nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+    n = (nx * nx + ny * ny + nz * nz) ** 0.5 or 1
+    return nx / n, ny / n, nz / n
+
+
+def write_stl(file_path: str, tris, scale: float = 1 / MM):
+    # stl is unitless, slicers assume mm
+    record = struct.Struct("<12fH")
+    count = 0
+    with open(file_path, "wb") as f:
+        f.write(b"keyboard-case-generator plate".ljust(80, b" "))
+        f.write(struct.pack("<I", 0))
+        for t in tris:
+            f.write(record.pack(*normal(t), *(v * scale for p in t for v in p), 0))
+            count += 1
+        f.seek(80)
+        f.write(struct.pack("<I", count))
+    return count
+
+
+def write_3mf(file_path: str, tris, scale: float = 1 / MM):
+    vertices, faces = {}, []
+    for t in tris:
+        faces.append(tuple(vertices.setdefault(p, len(vertices)) for p in t))
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+            '</Types>'
+        ))
+        z.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+            'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+            '</Relationships>'
+        ))
+        with z.open("3D/3dmodel.model", "w") as f:
+            f.write(
+                b'<?xml version="1.0" encoding="UTF-8"?>'
+                b'<model unit="millimeter" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+                b'<resources><object id="1" type="model"><mesh><vertices>'
+            )
+            for x, y, z_ in vertices:
+                f.write(f'<vertex x="{x * scale:.6f}" y="{y * scale:.6f}" z="{z_ * scale:.6f}"/>'.encode())
+            f.write(b'</vertices><triangles>')
+            for v1, v2, v3 in faces:
+                f.write(f'<triangle v1="{v1}" v2="{v2}" v3="{v3}"/>'.encode())
+            f.write(b'</triangles></mesh></object></resources><build><item objectid="1"/></build></model>')
+    return len(faces)
+
+
+def write_plate(file_path: str, layout: Layout, key_holes: bool = False, config: Config = DEFAULT):
+    tris = triangles(plate_rings(layout, key_holes, config), config.PLATE_THICKNESS, config.PLATE_RAISE)
+    if file_path.lower().endswith(".3mf"):
+        return write_3mf(file_path, tris)
+    return write_stl(file_path, tris)
@@ -0,0 +1,209 @@
+from collections import namedtuple
+from math import cos, floor, sin
+from .common import *
+from .config import *
+from . import geometry, promicro, trrs
+
+# collision checks on a layout before any fusion work: key holes against the
+# split gap, the panel outline and each other, and the holders and bolt bosses
+# against each other and against the switches under the panel. everything is
+# reduced to boxes (x1, y1, x2, y2) in a uniform grid, so a check is a handful
+# of box tests per key.
+
+Issue = namedtuple("Issue", "kind message x y")
+
+# a wall thinner than this between a key hole and the panel edge is reported
+MIN_WALL = 1*MM
+
+
+def label(i: int, text: str) -> str:
+    return f"key {i} ({' '.join(text.split())})"
+
+
+def box(rect: Rect) -> tuple:
+    return (
+        min(rect.p1.x, rect.p2.x),
+        min(rect.p1.y, rect.p2.y),
+        max(rect.p1.x, rect.p2.x),
+        max(rect.p1.y, rect.p2.y),
+    )
+
+
+def grow(b: tuple, d: float) -> tuple:
+    return b[0] - d, b[1] - d, b[2] + d, b[3] + d
+
+
+def overlaps(a: tuple, b: tuple) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def circle_overlaps(b: tuple, center: Point, radius: float) -> bool:
+    dx = max(b[0] - center.x, 0, center.x - b[2])
+    dy = max(b[1] - center.y, 0, center.y - b[3])
+    return dx * dx + dy * dy < radius * radius
+
+
+def segment_overlaps(b: tuple, p: Point, q: Point) -> bool:
+    # liang-barsky clip of pq against the open box
+    t0, t1 = 0.0, 1.0
+    dx, dy = q.x - p.x, q.y - p.y
+    for d, lo, hi, v in ((dx, b[0], b[2], p.x), (dy, b[1], b[3], p.y)):
+        if d == 0:
+            if not lo < v < hi:
+                return False
+            continue
+        a, c = (lo - v) / d, (hi - v) / d
+        if a > c:
+            a, c = c, a
+        t0, t1 = max(t0, a), min(t1, c)
+        if t0 >= t1:
+            return False
+    return True
+
+
+def separated(a: List[Point], b: List[Point]) -> bool:
+    # separating axis test of two convex outlines (a segment is two points),
+    # touching counts as separated like the open boxes above
+    for points in (a, b):
+        l = len(points)
+        for k in range(l if l > 2 else 1):
+            p, q = points[k], points[(k + 1) % l]
+            nx, ny = p.y - q.y, q.x - p.x
+            pa = [nx * v.x + ny * v.y for v in a]
+            pb = [nx * v.x + ny * v.y for v in b]
+            if max(pa) <= min(pb) or max(pb) <= min(pa):
+                return True
+    return False
+
+
+def contains(points: List[Point], x: float, y: float) -> bool:
+    inside = False
+    l = len(points)
+    for i in range(l):
+        a, b = points[i], points[(i + 1) % l]
+        if (a.y > y) != (b.y > y) and x < a.x + (y - a.y) * (b.x - a.x) / (b.y - a.y):
+            inside = not inside
+    return inside
+
+
+class Grid:
+    # uniform grid over boxes, query returns every item whose box shares a cell
+
+    def __init__(self, cell: float):
+        self.cell = cell
+        self.cells = {}
+
+    def cover(self, b: tuple):
+        c = self.cell
+        for i in range(floor(b[0] / c), floor(b[2] / c) + 1):
+            for j in range(floor(b[1] / c), floor(b[3] / c) + 1):
+                yield i, j
+
+    def insert(self, b: tuple, item):
+        for k in self.cover(b):
+            self.cells.setdefault(k, []).append((b, item))
+
+    def query(self, b: tuple) -> list:
+        seen, result = set(), []
+        for k in self.cover(b):
+            for other, item in self.cells.get(k, ()):
+                if id(item) not in seen and overlaps(b, other):
+                    seen.add(id(item))
+                    result.append(item)
+        return result
+
+
+def check_keys(layout: Layout, config: Config = DEFAULT) -> List[Issue]:
+    # panel frame: key clearance rects against each other and against the outline
+    # of the half they sit in, the split gap included. turned keys go through the
+    # grid with their bounding boxes and are then tested on their actual outline
+    issues = []
+    halves = [layout.left.vertices(), layout.right.vertices()]
+    edges = Grid(config.U)
+    for points in halves:
+        for i in range(len(points)):
+            p, q = points[i], points[(i + 1) % len(points)]
+            edges.insert((min(p.x, q.x), min(p.y, q.y), max(p.x, q.x), max(p.y, q.y)), (p, q))
+    keys = Grid(config.U)
+    outlines, turned = [], layout.keys.angle
+    for i, key in enumerate(layout.keys):
+        b = box(key.hole.rect)
+        cx, cy = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+        outlines.append(layout.keys.clearance(i).vertices())
+        for j in keys.query(b):
+            if not (turned[i] or turned[j]) or not separated(outlines[i], outlines[j]):
+                issues.append(Issue("overlap", f"{label(i, key.text)} overlaps key {j}", cx, cy))
+        keys.insert(b, i)
+        if turned[i]:
+            wide = layout.keys.clearance(i, MIN_WALL)
+            inner, outer, reach = outlines[i], wide.vertices(), box(wide.rect)
+            crosses = lambda outline, p, q: not separated(outline, [p, q])
+        else:
+            inner, outer, reach = b, grow(b, MIN_WALL), grow(b, MIN_WALL)
+            crosses = segment_overlaps
+        if not any(contains(points, cx, cy) for points in halves):
+            issues.append(Issue("outside", f"{label(i, key.text)} is outside the panel", cx, cy))
+        elif any(crosses(inner, p, q) for p, q in edges.query(b)):
+            issues.append(Issue("overlap", f"{label(i, key.text)} crosses the panel edge or split gap", cx, cy))
+        elif any(crosses(outer, p, q) for p, q in edges.query(reach)):
+            issues.append(Issue("thin wall", f"{label(i, key.text)} leaves less than {MIN_WALL / MM:g} mm of panel", cx, cy))
+    return issues
+
+
+def footprints(layout: Layout, config: Config = DEFAULT) -> list:
+    # (name, box, top z) of the parts standing on the plates, in the xy plane
+    top = config.PLATE_RAISE + config.PLATE_THICKNESS
+    v1, v2, v3, v4 = geometry.holder_anchors(layout, config)
+    result = []
+    for side, v in (("left", v1), ("right", v4)):
+        for p in promicro.get_promicro_holder(config):
+            result.append((f"{side} promicro holder", box(p.translate(v).rect), top + config.HOLDER_HEIGHT))
+        pcb, usb = promicro.get_promicro_rects(config)
+        result.append((f"{side} promicro", box(pcb.translate(v)), top + config.PROMICRO_Y + config.PROMICRO_T))
+        result.append((f"{side} usb", box(usb.translate(v)), top + config.PROMICRO_Y + config.PROMICRO_T + config.USB_H))
+    for side, v in (("left", v2), ("right", v3)):
+        for p in trrs.get_trrs_holder(config):
+            result.append((f"{side} trrs holder", box(p.translate(v).rect), top + config.HOLDER_HEIGHT))
+        result.append((f"{side} trrs", box(trrs.get_trrs_rect(config).translate(v)), top + config.TRRS_T))
+    return result
+
+
+def check_parts(layout: Layout, config: Config = DEFAULT) -> List[Issue]:
+    # xy plane: holders against bolt bosses, and both against the switches hanging
+    # SWITCH_CLEARANCE below the tilted panel
+    issues = []
+    p1, _, _ = geometry.panel_plane_points(layout, config)
+    a = geometry.panel_tilt(layout, config)
+    c, s = cos(a), sin(a)
+    keys = Grid(config.U)
+    for i, key in enumerate(layout.keys):
+        x1, y1, x2, y2 = box(key.hole.rect)
+        # lowest point of the switch, at the front edge of its hole
+        bottom = p1.z + y1 * s - config.SWITCH_CLEARANCE * c
+        keys.insert((x1, y1 * c, x2, y2 * c), (i, key.text, (x1, y1 * c, x2, y2 * c), bottom))
+    bolts = [(p, config.BOLT_OUTER_RADIUS) for p in geometry.bolt_centers(layout, config)]
+    for center, radius in bolts:
+        b = (center.x - radius, center.y - radius, center.x + radius, center.y + radius)
+        for i, text, kb, _ in keys.query(b):
+            if circle_overlaps(kb, center, radius):
+                issues.append(Issue("overlap", f"bolt boss at {center} hits the switch of {label(i, text)}", center.x, center.y))
+    for name, b, z in footprints(layout, config):
+        cx, cy = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+        for center, radius in bolts:
+            if circle_overlaps(b, center, radius):
+                issues.append(Issue("overlap", f"{name} hits the bolt boss at {center}", cx, cy))
+        for i, text, _, bottom in keys.query(b):
+            if bottom < z:
+                issues.append(Issue("overlap", f"{name} reaches the switch of {label(i, text)}", cx, cy))
+    return issues
+
+
+def check(layout: Layout, config: Config = DEFAULT) -> List[Issue]:
+    return check_keys(layout, config) + check_parts(layout, config)
+
+
+def summary(issues: List[Issue], limit: int = 20) -> str:
+    lines = [f"{i.kind}: {i.message}" for i in issues[:limit]]
+    if len(issues) > limit:
+        lines.append(f"... and {len(issues) - limit} more")
+    return "\n".join(lines)
@@ -2,9 +2,9 @@ from .common import *
 from .config import *
 
 
-def get_promicro_holder():
-    pcb_height = PROMICRO_H - (WALL_THICKNESS - USB_L + PLATE_GAP)
-    x, y, t = PROMICRO_W / 2, pcb_height, HOLDER_THICKNESS
+def get_promicro_holder(config: Config = DEFAULT):
+    pcb_height = config.PROMICRO_H - (config.WALL_THICKNESS - config.USB_L + config.PLATE_GAP)
+    x, y, t = config.PROMICRO_W / 2, pcb_height, config.HOLDER_THICKNESS
     bottom_clamp = Polygon(
         points=fold_points_y([
             Point(x, 0),
@@ -26,10 +26,10 @@ def get_promicro_holder():
         bottom_clamp.translate(Vector(dy=-y))
     ]
 
-def get_promicro_rects():
-    x1, x2 = PROMICRO_W / 2, USB_W / 2
-    y = WALL_THICKNESS - USB_L + PLATE_GAP
+def get_promicro_rects(config: Config = DEFAULT):
+    x1, x2 = config.PROMICRO_W / 2, config.USB_W / 2
+    y = config.WALL_THICKNESS - config.USB_L + config.PLATE_GAP
     return (
-        Rect(Point(-x1, y), Point(x1, y - PROMICRO_H)),
-        Rect(Point(-x2, y), Point(x2, y - USB_L)),
+        Rect(Point(-x1, y), Point(x1, y - config.PROMICRO_H)),
+        Rect(Point(-x2, y), Point(x2, y - config.USB_L)),
     )
\ No newline at end of file
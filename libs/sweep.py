@@ -0,0 +1,54 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from .common import *
+from .config import *
+from . import kle, geometry
+
+# headless parameter sweep: evaluates a layout against a grid of configs in a
+# process pool and reports the geometric outputs, no fusion involved.
+#
+#   configs = grid(DEFAULT, WALL_THICKNESS=[1.6*MM, 2*MM], PLATE_GAP=[0.3*MM, 0.5*MM])
+#   for config, result in sweep(json.load(f), configs):
+#       ...
+
+
+def evaluate(data: list, config: Config = DEFAULT) -> dict:
+    layout = kle.from_json(data, config)
+    return dict(
+        keys=len(layout.keys),
+        case_area=[abs(geometry.signed_area(o.vertices())) for o in geometry.case_outlines(layout, config)],
+        wall_area=[abs(geometry.signed_area(o.vertices())) for o in geometry.wall_outlines(layout, config)],
+        plate_area=[abs(geometry.signed_area(o.vertices())) for o in geometry.plate_outlines(layout, config)],
+        tilt=geometry.panel_tilt(layout, config),
+        bolt_centers=[(p.x, p.y) for p in geometry.bolt_centers(layout, config)],
+        holder_anchors=[(v.dx, v.dy) for v in geometry.holder_anchors(layout, config)],
+    )
+
+
+def grid(base: Config = DEFAULT, **axes) -> List[Config]:
+    names = list(axes)
+    return [base.replace(**dict(zip(names, values))) for values in product(*axes.values())]
+
+
+def sweep(data: list, configs: List[Config], processes: int = None):
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = pool.map(evaluate, [data] * len(configs), configs)
+        yield from zip(configs, results)
+
+
+def report(results, file_path: str):
+    rows = []
+    for config, result in results:
+        rows.append(dict(config=config_changes(config), **result))
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    return rows
+
+
+def config_changes(config: Config, base: Config = DEFAULT) -> dict:
+    return {
+        name: getattr(config, name)
+        for name in Config.__dataclass_fields__
+        if getattr(config, name) != getattr(base, name)
+    }
@@ -0,0 +1,160 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+from .common import *
+from .config import *
+
+# plate cutout templates per switch family and key width. every template has a
+# stable name ("mx-1u", "mx-2u", "mx-6.25u", "choc-2u", ...) so keys only store
+# the template id and identical holes can be grouped downstream.
+
+# stabilizer housing offset from the switch center by minimum key width, below
+# 3u the config STB_HOLE_DX is used. 2u holes join the housings to the switch
+# cutout with a canal, wider keys get the housings as separate cutouts
+STAB_DX = (
+    (3, 19.05*MM),
+    (6.25, 50*MM),
+    (7, 57.15*MM),
+    (8, 66.675*MM),
+)
+STAB_WIDTHS = (2,) + tuple(w for w, _ in STAB_DX)
+
+
+def cutout_size(config: Config = DEFAULT) -> Tuple[float, float]:
+    if config.SWITCH == "mx":
+        return config.HOLE_SIZE, config.HOLE_SIZE
+    if config.SWITCH == "choc":
+        return config.CHOC_HOLE_SIZE, config.CHOC_HOLE_SIZE
+    if config.SWITCH == "alps":
+        return config.ALPS_HOLE_W, config.ALPS_HOLE_H
+    raise ValueError(f"unknown switch {config.SWITCH!r}")
+
+
+def stabilized(config: Config = DEFAULT) -> bool:
+    # alps stabilizers are not modelled, wide alps keys get the plain cutout
+    return config.SWITCH != "alps"
+
+
+def stab_dx(uw: float, config: Config = DEFAULT) -> float:
+    dx = config.STB_HOLE_DX
+    for width, spacing in STAB_DX:
+        if uw >= width:
+            dx = spacing
+    return dx
+
+
+def template_width(uw: float, config: Config = DEFAULT) -> float:
+    if uw < 2 or not stabilized(config):
+        return 1
+    return max(w for w in STAB_WIDTHS if w <= uw)
+
+
+def template_name(uw: float, config: Config = DEFAULT) -> str:
+    return f"{config.SWITCH}-{template_width(uw, config):g}u"
+
+
+def plain_hole(config: Config = DEFAULT) -> Polygon:
+    w, h = cutout_size(config)
+    x, y = w / 2, h / 2
+    return Polygon(
+        points=[
+            Point(-x, +y),
+            Point(+x, -y),
+        ],
+        rect=Rect(
+            Point(-x, +y + 0.5*MM),
+            Point(+x, -y - 0.5*MM),
+        )
+    )
+
+
+def stabilized_hole(dx: float, config: Config = DEFAULT) -> Polygon:
+    # 2u: the switch cutout and both stabilizer housings joined by a canal
+    w, h = cutout_size(config)
+    x, y = w / 2, h / 2
+    # notches keep their distance to the stabilizer housing
+    side_dx = dx + config.SIDE_NOTCH_DX - config.STB_HOLE_DX
+    bott_dx = dx + config.BOTT_NOTCH_DX - config.STB_HOLE_DX
+    stb_x1, stb_y1, stb_x2, stb_y2 = rxry_to_xyxy(dx, -config.STB_HOLE_DY, config.STB_HOLE_W, config.STB_HOLD_H)
+    noh_x1, noh_y1, noh_x2, noh_y2 = rxry_to_xyxy(side_dx, config.SIDE_NOTCH_DY, config.SIDE_NOTCH_W, config.SIDE_NOTCH_H)
+    bot_x1, bot_y1, bot_x2, bot_y2 = rxry_to_xyxy(bott_dx, -config.BOTT_NOTCH_DY, config.BOTT_NOTCH_W, config.BOTT_NOTCH_H)
+    return Polygon(
+        points=fold_points_y([
+            Point(+x, +y),                  # key hole tr
+            Point(+x, +y - 3*MM),           # canal tl
+            Point(stb_x1, +y - 3*MM),       # canal tr
+            Point(stb_x1, stb_y1),          # stablizer tl
+            Point(stb_x2, stb_y1),          # stablizer tr
+            Point(stb_x2, noh_y1),          # side notch tl
+            Point(noh_x2, noh_y1),          # side notch tr
+            Point(noh_x2, noh_y2),          # side notch br
+            Point(stb_x2, noh_y2),          # side notch bl
+            Point(stb_x2, stb_y2),          # stablizer br
+            Point(bot_x2, stb_y2),          # bottom notch tr
+            Point(bot_x2, bot_y2),          # bottom notch br
+            Point(bot_x1, bot_y2),          # bottom notch bl
+            Point(bot_x1, stb_y2),          # bottom notch tl
+            Point(stb_x1, stb_y2),          # stablizer bl
+            Point(stb_x1, stb_y2 + 3*MM),   # canal br
+            Point(+x, stb_y2 + 3*MM),       # canal bl
+            Point(+x, -y),                  # key hole br
+        ]),
+        rect=stabilized_rect(dx, config),
+    )
+
+
+def stabilized_rect(dx: float, config: Config = DEFAULT) -> Rect:
+    # clearance of a stabilized key, out to the side notches
+    _, h = cutout_size(config)
+    x = dx + config.SIDE_NOTCH_DX - config.STB_HOLE_DX + config.SIDE_NOTCH_W / 2
+    return Rect(Point(-x, h / 2 + 0.5*MM), Point(+x, -h / 2 - 3.3*MM))
+
+
+def housing(config: Config = DEFAULT) -> Polygon:
+    # right stabilizer housing about its own center, side notch pointing away from the switch
+    side_dx = config.SIDE_NOTCH_DX - config.STB_HOLE_DX
+    bott_dx = config.BOTT_NOTCH_DX - config.STB_HOLE_DX
+    stb_x1, stb_y1, stb_x2, stb_y2 = rxry_to_xyxy(0, -config.STB_HOLE_DY, config.STB_HOLE_W, config.STB_HOLD_H)
+    noh_x1, noh_y1, noh_x2, noh_y2 = rxry_to_xyxy(side_dx, config.SIDE_NOTCH_DY, config.SIDE_NOTCH_W, config.SIDE_NOTCH_H)
+    bot_x1, bot_y1, bot_x2, bot_y2 = rxry_to_xyxy(bott_dx, -config.BOTT_NOTCH_DY, config.BOTT_NOTCH_W, config.BOTT_NOTCH_H)
+    return Polygon([
+        Point(stb_x1, stb_y1),          # stablizer tl
+        Point(stb_x2, stb_y1),          # stablizer tr
+        Point(stb_x2, noh_y1),          # side notch tl
+        Point(noh_x2, noh_y1),          # side notch tr
+        Point(noh_x2, noh_y2),          # side notch br
+        Point(stb_x2, noh_y2),          # side notch bl
+        Point(stb_x2, stb_y2),          # stablizer br
+        Point(bot_x2, stb_y2),          # bottom notch tr
+        Point(bot_x2, bot_y2),          # bottom notch br
+        Point(bot_x1, bot_y2),          # bottom notch bl
+        Point(bot_x1, stb_y2),          # bottom notch tl
+        Point(stb_x1, stb_y2),          # stablizer bl
+    ])
+
+
+def wide_hole(dx: float, config: Config = DEFAULT) -> Polygon:
+    # 3u and wider: the plain switch cutout, the housings are cut separately
+    return Polygon(plain_hole(config).points, stabilized_rect(dx, config))
+
+
+def housing_pair(dx: float, config: Config = DEFAULT) -> List[Polygon]:
+    right = housing(config).translate(Vector(dx))
+    return [right, right.mirror_y()]
+
+
+@lru_cache(maxsize=None)
+def templates(config: Config = DEFAULT) -> Dict[str, Polygon]:
+    result = {template_name(1, config): plain_hole(config)}
+    if stabilized(config):
+        for width in STAB_WIDTHS:
+            hole = stabilized_hole if width < 3 else wide_hole
+            result[template_name(width, config)] = hole(stab_dx(width, config), config)
+    return result
+
+
+@lru_cache(maxsize=None)
+def housings(config: Config = DEFAULT) -> Dict[str, List[Polygon]]:
+    # separate stabilizer cutouts of the templates that have them, in template coordinates
+    if not stabilized(config):
+        return {}
+    return {template_name(w, config): housing_pair(stab_dx(w, config), config) for w in STAB_WIDTHS if w >= 3}
@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+# opt-in tracing of every attribute read and method call on the fusion objects
+# the helpers hold, the result loads in chrome://tracing / speedscope
+# (trace.json) or flamegraph.pl (.folded)
+
+_tracer = None
+
+
+class Tracer:
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+        self.started = time.perf_counter()
+        self.events = []
+        self.folded = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def call_site(self) -> list:
+        stack = []
+        frame = sys._getframe(1)
+        while frame:
+            file_path = frame.f_code.co_filename
+            if file_path != __file__ and file_path.startswith(self.root_dir):
+                stack.append(f"{os.path.basename(file_path)}:{frame.f_code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return stack[::-1]
+
+    def record(self, name: str, started: float, ended: float):
+        stack = self.call_site()
+        key = ";".join(stack + [name])
+        self.folded[key] += (ended - started) * 1e6
+        self.counts[key] += 1
+        self.events.append(dict(
+            name=name,
+            cat="api",
+            ph="X",
+            ts=(started - self.started) * 1e6,
+            dur=(ended - started) * 1e6,
+            pid=1,
+            tid=1,
+            args=dict(site=stack[-1] if stack else ""),
+        ))
+
+    def write_trace(self, file_path: str):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(dict(traceEvents=self.events, displayTimeUnit="ms"), f)
+
+    def write_folded(self, file_path: str):
+        with open(file_path, "w", encoding="utf-8") as f:
+            for key, us in sorted(self.folded.items()):
+                f.write(f"{key} {round(us)}\n")
+
+
+def is_api_object(value) -> bool:
+    return type(value).__module__.startswith("adsk")
+
+
+def record(name: str, started: float):
+    if _tracer:
+        _tracer.record(name, started, time.perf_counter())
+
+
+def wrap(value):
+    if isinstance(value, Proxy):
+        return value
+    if is_api_object(value):
+        return Proxy(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(wrap(v) for v in value)
+    return value
+
+
+def unwrap(value):
+    if isinstance(value, Proxy):
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (list, tuple)):
+        return type(value)(unwrap(v) for v in value)
+    return value
+
+
+class Proxy:
+    __slots__ = ("_target",)
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    @property
+    def __class__(self):
+        # keeps isinstance checks against adsk types working
+        return type(object.__getattribute__(self, "_target"))
+
+    def __getattr__(self, attr):
+        target = object.__getattribute__(self, "_target")
+        name = f"{type(target).__name__}.{attr}"
+        started = time.perf_counter()
+        value = getattr(target, attr)
+        if callable(value) and not is_api_object(value):
+            def call(*args, **kwargs):
+                started = time.perf_counter()
+                result = value(*unwrap(args), **{k: unwrap(v) for k, v in kwargs.items()})
+                record(f"{name}()", started)
+                return wrap(result)
+            return call
+        record(name, started)
+        return wrap(value)
+
+    def __setattr__(self, attr, value):
+        target = object.__getattribute__(self, "_target")
+        started = time.perf_counter()
+        setattr(target, attr, unwrap(value))
+        record(f"{type(target).__name__}.{attr}=", started)
+
+    def __iter__(self):
+        return (wrap(v) for v in object.__getattribute__(self, "_target"))
+
+    def __len__(self):
+        return len(object.__getattribute__(self, "_target"))
+
+    def __getitem__(self, i):
+        return wrap(object.__getattribute__(self, "_target")[i])
+
+    def __bool__(self):
+        return bool(object.__getattribute__(self, "_target"))
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, "_target") == unwrap(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return id(object.__getattribute__(self, "_target"))
+
+    def __repr__(self):
+        return f"Proxy({object.__getattribute__(self, '_target')!r})"
+
+
+def trace(value):
+    return wrap(value) if _tracer else value
+
+
+def enable(root_dir: str) -> Tracer:
+    global _tracer
+    _tracer = Tracer(root_dir)
+    return _tracer
+
+
+def disable() -> Tracer:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
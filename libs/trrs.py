@@ -3,9 +3,9 @@ from .common import *
 from .config import *
 
 
-def get_trrs_holder():
-    trrs_height = TRRS_H - (WALL_THICKNESS - TRRS_L + PLATE_GAP)
-    x, y, t = TRRS_W / 2, -trrs_height, HOLDER_THICKNESS
+def get_trrs_holder(config: Config = DEFAULT):
+    trrs_height = config.TRRS_H - (config.WALL_THICKNESS - config.TRRS_L + config.PLATE_GAP)
+    x, y, t = config.TRRS_W / 2, -trrs_height, config.HOLDER_THICKNESS
     return [Polygon(
         points=fold_points_y([
             Point(x, y),
@@ -16,10 +16,10 @@ def get_trrs_holder():
     )]
 
 
-def get_trrs_rect():
-    x = TRRS_W / 2
-    y = WALL_THICKNESS - TRRS_L + PLATE_GAP
+def get_trrs_rect(config: Config = DEFAULT):
+    x = config.TRRS_W / 2
+    y = config.WALL_THICKNESS - config.TRRS_L + config.PLATE_GAP
     return Rect(
         p1=Point(-x, y),
-        p2=Point(+x, y - TRRS_H),
+        p2=Point(+x, y - config.TRRS_H),
     )
\ No newline at end of file
@@ -1,361 +1,670 @@
+import os
+import json
+import traceback
+from os import path
 from adsk.core import *
 from adsk.fusion import *
 from .libs.common import *
-from .libs import kle, promicro, trrs
+from .libs import kle, promicro, trrs, geometry, preflight
+from .libs.instrument import Recorder
+from .libs import tracer
+from .libs.digest import digest, config_items
 from .helper import *
 from .debug import *
 
+# name prefixes of the bodies build() creates
+GENERATED_BODIES = ("case", "plate", "promicro", "usb", "trrs", "key_hole_tool")
 
-def main(app: Application):
+
+def main(app: Application, summary: bool = False, profile: bool = False, fast: bool = False, direct: bool = False):
 
     ui = app.userInterface
 
+    design = Design.cast(app.activeProduct)
+    if direct and design.designType == DesignTypes.ParametricDesignType and design.timeline.count:
+        answer = ui.messageBox(
+            "Building without history permanently removes the timeline of this design, it can not be undone. Continue?",
+            "Direct modeling",
+            MessageBoxButtonTypes.YesNoButtonType,
+        )
+        if answer != DialogResults.DialogYes:
+            return
+
     fileDlg = ui.createFileDialog()
-    fileDlg.isMultiSelectEnabled = False
+    fileDlg.isMultiSelectEnabled = True
     fileDlg.title = "Keyboard Layout Editor  JSON file"
     fileDlg.filter = "*.json"
     dlgResult = fileDlg.showOpen()
     if dlgResult != DialogResults.DialogOK:
         return
-    layout = kle.from_file(fileDlg.filename)
+    if len(fileDlg.filenames) > 1:
+        batch(app, list(fileDlg.filenames), fast=fast, direct=direct, summary=summary, profile=profile)
+        return
     # layout = kle.from_file(r"C:\Users\Klesh\Desktop\ks63\ks-63.json")
     root = ComponentHelper(app.activeProduct.rootComponent)
+    layout = kle.from_file(fileDlg.filename)
+    issues = preflight.check(layout)
+    if issues:
+        answer = ui.messageBox(
+            preflight.summary(issues) + "\n\nGenerate anyway?",
+            "Layout check",
+            MessageBoxButtonTypes.YesNoButtonType,
+        )
+        if answer != DialogResults.DialogYes:
+            return
+    progress = Progress(ui, "Generating keyboard case", len(stage_names(fast, direct)), len(layout.keys))
+    try:
+        recorder = generate(root, layout, fileDlg.filename, profile, fast, direct, progress, summary)
+    except Cancelled as e:
+        ui.messageBox(f"Cancelled during {e}, run again to continue from there.", "Generation cancelled")
+        return
+    finally:
+        progress.hide()
+    if summary:
+        ui.messageBox(recorder.summary(), "Generation stages")
+
+
+def generate(
+    root: ComponentHelper,
+    layout: Layout,
+    file_path: str,
+    profile: bool = False,
+    fast: bool = False,
+    direct: bool = False,
+    progress: Progress = None,
+    summary: bool = False,
+) -> Recorder:
+    # fast builds the key holes as one in-memory tool body in a base feature and
+    # cuts each case with it in a single combine, trading history for speed.
+    # direct builds with history capture off, so fusion never recomputes the
+    # downstream features, and always from scratch: without a timeline there is
+    # nothing to roll back or stamp, so clear() deletes what earlier builds left.
+    # switching to direct drops the design's timeline for good, and a design that
+    # is direct already has no timeline for Stages.rollback to order deletions by,
+    # so it always gets the direct build. summary measures api calls and memory
+    # per stage and writes them next to the layout.
+    if profile:
+        tracer.enable(path.dirname(__file__))
+        # a helper made before tracing holds the bare component, wrap it again
+        root = ComponentHelper(tracer.unwrap(root.component))
+    direct = direct or root.is_direct
+    recorder = Recorder(instrument=summary)
+    stage = progress.wrap(recorder.stage) if progress else recorder.stage
+    stages = None
+    if not direct:
+        with stage("rollback"):
+            stages = get_stages(root, layout, fast)
+            stages.rollback()
+    try:
+        with root.direct_modeling(direct):
+            if direct:
+                with stage("clear"):
+                    clear(root, layout)
+            build(root, layout, stage, fast, progress.tick if progress else None)
+    finally:
+        if stages:
+            stages.stamp()
+        report = path.splitext(file_path)[0]
+        if summary:
+            recorder.write(report + ".stats.json")
+        if profile:
+            api_trace = tracer.disable()
+            api_trace.write_trace(report + ".trace.json")
+            api_trace.write_folded(report + ".folded")
+    return recorder
+
+
+def batch(
+    app: Application,
+    sources,
+    spacing: float = 5 * U,
+    fast: bool = False,
+    direct: bool = False,
+    summary: bool = False,
+    profile: bool = False,
+):
+    # every layout goes into its own child component, named after the file, laid
+    # out along -y. a component whose source hash matches is left untouched, one
+    # whose layout changed is rebuilt incrementally.
+    if isinstance(sources, str):
+        sources = sorted(path.join(sources, f) for f in os.listdir(sources) if f.endswith(".json"))
+    if not sources:
+        app.userInterface.messageBox("no layouts", "Batch generation")
+        return []
+    root = ComponentHelper(app.activeProduct.rootComponent)
+    results, y = [], 0
+    for file_path in sources:
+        name = path.splitext(path.basename(file_path))[0]
+        result = dict(name=name, file=file_path)
+        results.append(result)
+        # a layout that fails still takes its slot, so the next one can not overlap it
+        height = 0
+        try:
+            with open(file_path, "rb") as f:
+                source_hash = digest(f.read(), config_items(), fast)
+            layout = kle.from_file(file_path)
+            result.update(issues=[i.message for i in preflight.check(layout)])
+            height = layout.rect.h
+            component = root.child(name)
+            if component and Stages.stored_hash(component, "source") == source_hash:
+                result.update(status="skipped")
+            else:
+                component = component or root.add_child(name, Vector(dy=y - height / 2))
+                progress = Progress(app.userInterface, f"Generating {name}", len(stage_names(fast, direct)), len(layout.keys))
+                try:
+                    recorder = generate(
+                        ComponentHelper(component),
+                        layout,
+                        file_path,
+                        profile=profile,
+                        fast=fast,
+                        direct=direct,
+                        progress=progress,
+                        summary=summary,
+                    )
+                finally:
+                    progress.hide()
+                Stages.store_hash(component, source_hash, "source")
+                result.update(status="built", seconds=recorder.report()["seconds"])
+        except Cancelled:
+            result.update(status="cancelled")
+            break
+        except:
+            result.update(status="failed", error=traceback.format_exc())
+        finally:
+            y -= height + spacing
+    with open(path.join(path.dirname(sources[0]), "batch.stats.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("built", "skipped", "failed", "cancelled")}
+    app.userInterface.messageBox(
+        "\n".join([", ".join(f"{v} {k}" for k, v in counts.items())] + [
+            f"{r['name']}: {r['status']}" for r in results
+        ]),
+        "Batch generation",
+    )
+    return results
+
+
+def get_stages(root: ComponentHelper, layout: Layout, fast: bool = False) -> Stages:
+    outlines = geometry.case_outlines(layout)
+    bolts = geometry.bolt_centers(layout)
+    anchors = geometry.holder_anchors(layout)
+    stages = Stages(root)
+    add = stages.add
+    add("sketch:panel_plane_sketch", [geometry.panel_plane_points(layout)])
+    add("plane:panel_plane", [], "sketch:panel_plane_sketch")
+    add("sketch:panel", [layout.left, layout.right], "plane:panel_plane")
+    add("extrude:panel_ext", [PANEL_TOP_THICKNESS, PANEL_BOTTOM_THICKNESS], "sketch:panel")
+    add("sketch:wall", [outlines, geometry.wall_outlines(layout)])
+    add("extrude:wall_ext", [], "sketch:wall", "extrude:panel_ext")
+    key_stages = ["sketch:panel_top", "extrude:panel_top_ext", "sketch:panel_bottom", "extrude:panel_bottom_ext"]
+    fast_key_stages = ["base:key_holes", "combine:key_holes_1", "combine:key_holes_2"]
+    if fast:
+        add("base:key_holes", [layout.keys, PANEL_TOP_THICKNESS, SWITCH_CLEARANCE], "sketch:panel")
+        for i in (1, 2):
+            add(f"combine:key_holes_{i}", [], "base:key_holes", "extrude:wall_ext")
+        holes = fast_key_stages[-1]
+    else:
+        add("sketch:panel_top", [layout.keys], "plane:panel_plane")
+        add("extrude:panel_top_ext", [], "sketch:panel_top", "extrude:wall_ext")
+        add("sketch:panel_bottom", [layout.keys], "plane:panel_plane")
+        add("extrude:panel_bottom_ext", [SWITCH_CLEARANCE], "sketch:panel_bottom", "extrude:panel_top_ext")
+        holes = key_stages[-1]
+    for stage in key_stages if fast else fast_key_stages:
+        stages.drop(stage)
+    add("plane:bolt", [PLATE_RAISE, PLATE_THICKNESS, PLATE_BOLT_DIST])
+    add("sketch:bolt", [bolts, BOLT_OUTER_RADIUS], "plane:bolt")
+    add("extrude:bolt_ext", [], "sketch:bolt", holes)
+    add("fillet:wall_fillet", [layout.rect, WALL_THICKNESS, CORNER_RADIUS], "extrude:bolt_ext")
+    add("plane:plate", [PLATE_RAISE, PLATE_THICKNESS])
+    add("sketch:plate", [geometry.plate_outlines(layout)], "plane:plate")
+    add("extrude:plate_ext", [PLATE_THICKNESS], "sketch:plate")
+    add("sketch:screw", [bolts, BOLT_HOLE_RADIUS, PLATE_HOLE_RADIUS], "plane:plate")
+    add("extrude:plate_screw_ext", [PLATE_THICKNESS], "sketch:screw", "extrude:plate_ext")
+    add("extrude:bolt_screw_ext", [WALL_THICKNESS], "sketch:screw", "fillet:wall_fillet")
+    add("sketch:holder", [anchors, promicro.get_promicro_holder(), trrs.get_trrs_holder()], "plane:plate")
+    add("extrude:holder_ext", [HOLDER_HEIGHT], "sketch:holder", "extrude:plate_screw_ext")
+    add("plane:promicro", [PROMICRO_Y, PROMICRO_T], "plane:plate")
+    add("sketch:promicro", [anchors, promicro.get_promicro_rects()], "plane:promicro")
+    add("extrude:promicro_ext", [PROMICRO_T], "sketch:promicro")
+    add("extrude:usb_ext1", [USB_H], "sketch:promicro")
+    add("extrude:usb_ext2", [USB_H], "extrude:usb_ext1", "extrude:promicro_ext")
+    add("plane:trrs", [TRRS_T], "plane:plate")
+    add("sketch:trrs", [anchors, trrs.get_trrs_rect()], "plane:trrs")
+    add("extrude:trrs_ext1", [TRRS_T], "sketch:trrs")
+    for n in (1, 2):
+        add(f"sketch:trrs{n}_sock", [TRRS_RADIUS], "extrude:trrs_ext1")
+        add(f"extrude:trrs{n}_sock_ext", [TRRS_L], f"sketch:trrs{n}_sock")
+    for i in (1, 2):
+        if fast:
+            add(f"combine:breakout_{i}", [], "extrude:trrs1_sock_ext", "extrude:trrs2_sock_ext", "extrude:usb_ext2", "extrude:bolt_screw_ext")
+            stages.drop(f"combine:trrs_breakout_{i}")
+            stages.drop(f"combine:usb_breakout_{i}")
+        else:
+            add(f"combine:trrs_breakout_{i}", [], "extrude:trrs1_sock_ext", "extrude:trrs2_sock_ext", "extrude:bolt_screw_ext")
+            add(f"combine:usb_breakout_{i}", [], "extrude:usb_ext2", f"combine:trrs_breakout_{i}")
+            stages.drop(f"combine:breakout_{i}")
+    return stages
+
+
+def clear(root: ComponentHelper, layout: Layout):
+    # a direct design keeps no features, only the sketches, planes and bodies
+    # earlier builds left. build() would find the sketches by name and redo the
+    # extrudes on top of the old bodies, so all of it is deleted first
+    names = [stage.split(":", 1) for stage in get_stages(root, layout).hashes]
+    entities = [body for prefix in GENERATED_BODIES for body in root.prefixed("body", prefix)]
+    for kind in ("sketch", "plane"):
+        entities += [root.find(kind, name) for k, name in names if k == kind]
+    for entity in entities:
+        if entity and entity.isValid:
+            entity.deleteMe()
+    root.reindex()
+
+
+def stage_names(fast: bool = False, direct: bool = False) -> List[str]:
+    # the stages build() runs, in order, for the progress dialog
+    return (
+        (["clear"] if direct else ["rollback"])
+        + ["panel", "wall"]
+        + (["key_holes"] if fast else ["panel_top", "panel_bottom"])
+        + ["bolt", "wall_fillet", "plate", "screw", "bolt_screw", "holder", "promicro", "usb", "trrs", "trrs_sock", "breakout"]
+    )
+
+
+def build(root: ComponentHelper, layout: Layout, stage=None, fast: bool = False, tick=None):
+    stage = stage or Recorder().stage
+    tick = tick or (lambda done, total: None)
 
     #################################
     #   panel
     #################################
 
-    panel_plane_sketch = SketchHelper.wrap(root.sketches.itemByName("panel_plane_sketch"))
-    if not panel_plane_sketch:
-        panel_plane_sketch = SketchHelper.wrap(root.add_sketch(root.xyplane))
-        z = solve_intercept(layout.rect.p1.y, FRONT_HEIGHT, layout.rect.p2.y, REAR_HEIGHT)
-        panel_plane_sketch.add_point(Point(0, 0, z)),
-        panel_plane_sketch.add_point(Point(5, 0, z)),
-        panel_plane_sketch.add_point(Point(0, 5, REAR_HEIGHT)),
-        panel_plane_sketch.is_visible = False
-        panel_plane_sketch.name = "panel_plane_sketch"
-
-    panel_plane = root.planes.itemByName("panel_plane")
-    if not panel_plane:
-        panel_plane = root.add_three_points_plane(*panel_plane_sketch.points_without_origin)
-        panel_plane.name = "panel_plane"
-
-    panel_sketch = SketchHelper.wrap(root.sketches.itemByName("panel"))
-    if not panel_sketch:
-        panel_sketch = SketchHelper.wrap(root.add_sketch(panel_plane))
-        panel_sketch.add_polygon(layout.left)
-        panel_sketch.add_polygon(layout.right)
-        panel_sketch.name = "panel"
-
-    panel_ext = ExtrudeHelper.wrap(root.extrudes.itemByName("panel_ext"))
-    if not panel_ext:
-        panel_ext = ExtrudeHelper.wrap(root.add_two_sides_extrude(
-            panel_sketch.profiles,
-            FeatureOperations.NewBodyFeatureOperation,
-            PANEL_TOP_THICKNESS,
-            PANEL_BOTTOM_THICKNESS,
-        ))
-        for index, body in enumerate(panel_ext.sorted_bodies):
-            body.name = f"case_{index+1}"
-        panel_ext.name = "panel_ext"
-
-    cases = [b for b in root.bodies if b.name.startswith("case")]
+    with stage("panel"):
+        panel_plane_sketch = SketchHelper.wrap(root.find("sketch", "panel_plane_sketch"))
+        if not panel_plane_sketch:
+            panel_plane_sketch = SketchHelper.wrap(root.add_sketch(root.xyplane))
+            with panel_plane_sketch.batch():
+                for p in geometry.panel_plane_points(layout):
+                    panel_plane_sketch.add_point(p)
+            panel_plane_sketch.is_visible = False
+            root.name("sketch", panel_plane_sketch.sketch, "panel_plane_sketch")
+
+        panel_plane = root.find("plane", "panel_plane")
+        if not panel_plane:
+            panel_plane = root.add_three_points_plane(*panel_plane_sketch.points_without_origin)
+            root.name("plane", panel_plane, "panel_plane")
+
+        panel_sketch = SketchHelper.wrap(root.find("sketch", "panel"))
+        if not panel_sketch:
+            panel_sketch = SketchHelper.wrap(root.add_sketch(panel_plane))
+            with panel_sketch.batch():
+                panel_sketch.add_polygon(layout.left)
+                panel_sketch.add_polygon(layout.right)
+            root.name("sketch", panel_sketch.sketch, "panel")
+
+        panel_ext = ExtrudeHelper.wrap(root.find("extrude", "panel_ext"))
+        if not panel_ext:
+            panel_ext = ExtrudeHelper.wrap(root.add_two_sides_extrude(
+                panel_sketch.profiles,
+                FeatureOperations.NewBodyFeatureOperation,
+                PANEL_TOP_THICKNESS,
+                PANEL_BOTTOM_THICKNESS,
+            ))
+            for index, body in enumerate(panel_ext.sorted_bodies):
+                root.name("body", body, f"case_{index+1}")
+            root.name("extrude", panel_ext.extrude, "panel_ext")
+
+        cases = root.prefixed("body", "case")
     
 
     #################################
     #   wall
     #################################
 
-    wall_sketch = SketchHelper.wrap(root.sketches.itemByName("wall"))
-    if not wall_sketch:
-        wall_sketch = SketchHelper.wrap(root.add_sketch(root.xyplane))
-        wall_sketch.project(cases)
-        wall_sketch.offset(wall_sketch.profiles, WALL_THICKNESS)
-        wall_sketch.name = "wall"
-
-    wall_ext = root.extrudes.itemByName("wall_ext")
-    if not wall_ext:
-        wall_ext = root.add_one_side_extrude(
-            wall_sketch.sorted_profiles[0:2],
-            FeatureOperations.JoinFeatureOperation,
-            to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
-            bodies=cases,
-        )
-        wall_ext.name = "wall_ext"
+    with stage("wall"):
+        wall_sketch = SketchHelper.wrap(root.find("sketch", "wall"))
+        if not wall_sketch:
+            wall_sketch = SketchHelper.wrap(root.add_sketch(root.xyplane))
+            with wall_sketch.batch():
+                for outline in geometry.case_outlines(layout) + geometry.wall_outlines(layout):
+                    wall_sketch.add_polygon(outline)
+            root.name("sketch", wall_sketch.sketch, "wall")
+
+        wall_ext = root.find("extrude", "wall_ext")
+        if not wall_ext:
+            wall_ext = root.add_one_side_extrude(
+                # the rings between the case and the inner wall, the faces inside them are larger
+                wall_sketch.profiles_by_area[:2],
+                FeatureOperations.JoinFeatureOperation,
+                to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
+                bodies=cases,
+            )
+            root.name("extrude", wall_ext, "wall_ext")
 
     #################################
     #   key holes
     #################################
 
-    panel_top_sketch = SketchHelper.wrap(root.sketches.itemByName("panel_top"))
-    if not panel_top_sketch:
-        panel_top_sketch = SketchHelper.wrap(root.sketches.add(panel_plane))
-        for key in layout.keys:
-            panel_top_sketch.add_polygon(key.hole)
-        panel_top_sketch.name = "panel_top"
-
-    panel_top_ext = root.extrudes.itemByName("panel_top_ext")
-    if not panel_top_ext:
-        panel_top_ext = root.add_one_side_extrude(
-            panel_top_sketch.profiles,
-            FeatureOperations.CutFeatureOperation,
-            to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
-            bodies=cases
-        )
-        panel_top_ext.name = "panel_top_ext"
-
-    panel_bottom_sketch = SketchHelper.wrap(root.sketches.itemByName("panel_bottom"))
-    if not panel_bottom_sketch:
-        panel_bottom_sketch = SketchHelper.wrap(root.sketches.add(panel_plane))
-        for key in layout.keys:
-            panel_bottom_sketch.add_rect(key.hole.rect)
-        panel_bottom_sketch.name = "panel_bottom"
-
-    panel_bottom_ext = root.extrudes.itemByName("panel_bottom_ext")
-    if not panel_bottom_ext:
-        panel_bottom_ext = root.add_one_side_extrude(
-            panel_bottom_sketch.profiles,
-            FeatureOperations.CutFeatureOperation,
-            distance=-SWITCH_CLEARANCE,
-            bodies=cases
-        )
-        panel_bottom_ext.name = "panel_bottom_ext"
+    if fast:
+        with stage("key_holes"):
+            key_holes = None if root.is_direct else root.find("base", "key_holes")
+            if not key_holes:
+                boxes = []
+                for i in range(len(layout.keys)):
+                    t = layout.keys.template[i]
+                    template = layout.keys.templates[t]
+                    # the clearance rect contains the hole, the hole boxes start at the
+                    # clearance depth too so they overlap the rect instead of touching it.
+                    # boxes come from the upright template and turn with the key
+                    rects = [(template.rect, 0)] + [
+                        (r, 2 * PANEL_TOP_THICKNESS)
+                        for polygon in [template] + layout.keys.housings[t]
+                        for r in geometry.orthogonal_rects(polygon)
+                    ]
+                    for r, z2 in rects:
+                        p = layout.keys.place(i, Point(r.rx, r.ry))
+                        boxes.append((r.translate(Vector(p.x - r.rx, p.y - r.ry)), -SWITCH_CLEARANCE, z2, layout.keys.angle[i]))
+                tool = root.add_base_body(box_body(boxes, panel_sketch.sketch.transform, tick), "key_holes")
+                root.name("body", tool, "key_hole_tool")
+
+            for i, case in enumerate(cases):
+                name = f"key_holes_{i + 1}"
+                if not root.find("combine", name):
+                    combine = root.add_combine(
+                        case,
+                        [root.find("body", "key_hole_tool")],
+                        FeatureOperations.CutFeatureOperation,
+                        keep_tools=i < len(cases) - 1,
+                    )
+                    root.name("combine", combine, name)
+    else:
+        with stage("panel_top"):
+            panel_top_sketch = SketchHelper.wrap(root.find("sketch", "panel_top"))
+            if not panel_top_sketch:
+                panel_top_sketch = SketchHelper.wrap(root.sketches.add(panel_plane))
+                with panel_top_sketch.batch():
+                    for run in layout.keys.runs():
+                        tick(run.start + run.count, len(layout.keys))
+                        for polygon in layout.keys.cutouts(run.start):
+                            hole = panel_top_sketch.add_polygon(polygon)
+                            if run.count > 1:
+                                panel_top_sketch.add_pattern(hole, run.pitch, run.count)
+                root.name("sketch", panel_top_sketch.sketch, "panel_top")
+
+            panel_top_ext = root.find("extrude", "panel_top_ext")
+            if not panel_top_ext:
+                panel_top_ext = root.add_one_side_extrude(
+                    panel_top_sketch.profiles,
+                    FeatureOperations.CutFeatureOperation,
+                    to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
+                    bodies=cases
+                )
+                root.name("extrude", panel_top_ext, "panel_top_ext")
+
+        with stage("panel_bottom"):
+            panel_bottom_sketch = SketchHelper.wrap(root.find("sketch", "panel_bottom"))
+            if not panel_bottom_sketch:
+                panel_bottom_sketch = SketchHelper.wrap(root.sketches.add(panel_plane))
+                with panel_bottom_sketch.batch():
+                    for run in layout.keys.runs():
+                        tick(run.start + run.count, len(layout.keys))
+                        rect = panel_bottom_sketch.add_polygon(layout.keys.clearance(run.start))
+                        if run.count > 1:
+                            panel_bottom_sketch.add_pattern(rect, run.pitch, run.count)
+                root.name("sketch", panel_bottom_sketch.sketch, "panel_bottom")
+
+            panel_bottom_ext = root.find("extrude", "panel_bottom_ext")
+            if not panel_bottom_ext:
+                panel_bottom_ext = root.add_one_side_extrude(
+                    panel_bottom_sketch.profiles,
+                    FeatureOperations.CutFeatureOperation,
+                    distance=-SWITCH_CLEARANCE,
+                    bodies=cases
+                )
+                root.name("extrude", panel_bottom_ext, "panel_bottom_ext")
 
     #################################
     #   plate bolt
     #################################
 
-    bolt_plane = root.planes.itemByName("bolt")
-    if not bolt_plane:
-        bolt_plane = root.offset_plane(
-            root.xyplane,
-            PLATE_RAISE + PLATE_THICKNESS + PLATE_BOLT_DIST
-        )
-        bolt_plane.name = "bolt"
-
-    bolt_sketch = SketchHelper.wrap(root.sketches.itemByName("bolt"))
-    if not bolt_sketch:
-        bolt_sketch = SketchHelper.wrap(root.sketches.add(bolt_plane))
-        bolt_sketch.project_cut_edges(cases)
-        points = []
-        for prof in bolt_sketch.sorted_profiles[-2:]:
-            for p in pick(ProfileHelper(prof).sorted_points, [0, 1, -2, -1]):
-                points.append(p)
-        for p in points:
-            bolt_sketch.add_tangent_circle(p, BOLT_OUTER_RADIUS)
-        bolt_sketch.name = "bolt"
-
-    bolt_ext = root.extrudes.itemByName("bolt_ext")
-    if not bolt_ext:
-        bolt_ext = root.add_one_side_extrude(
-            sorted(bolt_sketch.profiles, key=lambda p: p.areaProperties().area)[:-2],
-            FeatureOperations.JoinFeatureOperation,
-            to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
-            bodies=cases
-        )
-        bolt_ext.name = "bolt_ext"
-
-
-    wall_fillet = root.fillets.itemByName("wall_fillet")
-    if not wall_fillet:
-        edges = ObjectCollection.create()
-        for case in cases:
-            for e in case.edges:
-                if (
-                    e.startVertex.geometry.z == 0
-                    and e.endVertex.geometry.z != 0
-                    and abs(abs(e.startVertex.geometry.x) - abs(layout.rect.p1.x)) <= WALL_THICKNESS * 2
-                ):
-                    edges.add(e)
-        wall_fillet = root.add_fillet(edges, CORNER_RADIUS)
-        wall_fillet.name = "wall_fillet"
+    with stage("bolt"):
+        bolt_plane = root.find("plane", "bolt")
+        if not bolt_plane:
+            bolt_plane = root.offset_plane(
+                root.xyplane,
+                PLATE_RAISE + PLATE_THICKNESS + PLATE_BOLT_DIST
+            )
+            root.name("plane", bolt_plane, "bolt")
+
+        bolt_sketch = SketchHelper.wrap(root.find("sketch", "bolt"))
+        if not bolt_sketch:
+            bolt_sketch = SketchHelper.wrap(root.sketches.add(bolt_plane))
+            with bolt_sketch.batch():
+                for center in geometry.bolt_centers(layout):
+                    bolt_sketch.add_circle(center, BOLT_OUTER_RADIUS)
+            root.name("sketch", bolt_sketch.sketch, "bolt")
+
+        bolt_ext = root.find("extrude", "bolt_ext")
+        if not bolt_ext:
+            bolt_ext = root.add_one_side_extrude(
+                bolt_sketch.profiles,
+                FeatureOperations.JoinFeatureOperation,
+                to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
+                bodies=cases
+            )
+            root.name("extrude", bolt_ext, "bolt_ext")
+
+
+    with stage("wall_fillet"):
+        wall_fillet = root.find("fillet", "wall_fillet")
+        if not wall_fillet:
+            edges = []
+            for corner in geometry.fillet_corners(layout):
+                for e in root.edges_at(corner):
+                    p1, p2 = e.startVertex.geometry, e.endVertex.geometry
+                    if (
+                        e.body.name.startswith("case")
+                        and (p1.z == 0) != (p2.z == 0)
+                        and abs(p1.x - p2.x) < SketchHelper.SNAP
+                        and abs(p1.y - p2.y) < SketchHelper.SNAP
+                        and e not in edges
+                    ):
+                        edges.append(e)
+            wall_fillet = root.add_fillet(edges, CORNER_RADIUS)
+            root.name("fillet", wall_fillet, "wall_fillet")
 
     #################################
     #   plate
     #################################
 
-    plate_plane = root.planes.itemByName("plate")
-    if not plate_plane:
-        plate_plane = root.offset_plane(root.xyplane, PLATE_RAISE + PLATE_THICKNESS)
-        plate_plane.name = "plate"
-
-    plate_sketch = SketchHelper.wrap(root.sketches.itemByName("plate"))
-    if not plate_sketch:
-        plate_sketch = SketchHelper.wrap(root.sketches.add(plate_plane))
-        plate_sketch.project_cut_edges(cases)
-        plate_sketch.offset(plate_sketch.sorted_profiles[-2:], PLATE_GAP)
-        plate_sketch.name = "plate"
-
-    plate_ext = root.extrudes.itemByName("plate_ext")
-    if not plate_ext:
-        plate_ext = root.add_one_side_extrude(
-            plate_sketch.sorted_profiles[4:6],
-            FeatureOperations.NewBodyFeatureOperation,
-            distance=-PLATE_THICKNESS,
-        )
-        plate_ext.name = "plate_ext"
-        for index, body in enumerate(ExtrudeHelper(plate_ext).sorted_bodies):
-            body.name = f"plate_{index + 1}"
+    with stage("plate"):
+        plate_plane = root.find("plane", "plate")
+        if not plate_plane:
+            plate_plane = root.offset_plane(root.xyplane, PLATE_RAISE + PLATE_THICKNESS)
+            root.name("plane", plate_plane, "plate")
+
+        plate_sketch = SketchHelper.wrap(root.find("sketch", "plate"))
+        if not plate_sketch:
+            plate_sketch = SketchHelper.wrap(root.sketches.add(plate_plane))
+            with plate_sketch.batch():
+                for outline in geometry.plate_outlines(layout):
+                    plate_sketch.add_polygon(outline)
+            root.name("sketch", plate_sketch.sketch, "plate")
+
+        plate_ext = root.find("extrude", "plate_ext")
+        if not plate_ext:
+            plate_ext = root.add_one_side_extrude(
+                plate_sketch.profiles,
+                FeatureOperations.NewBodyFeatureOperation,
+                distance=-PLATE_THICKNESS,
+            )
+            root.name("extrude", plate_ext, "plate_ext")
+            for index, body in enumerate(ExtrudeHelper(plate_ext).sorted_bodies):
+                root.name("body", body, f"plate_{index + 1}")
 
-    plates = [p for p in root.bodies if p.name.startswith("plate")]
+        plates = root.prefixed("body", "plate")
 
     #################################
     #   screw holes
     #################################
 
-    screw_sketch = SketchHelper.wrap(root.sketches.itemByName("screw"))
-    if not screw_sketch:
-        screw_sketch = SketchHelper.wrap(root.sketches.add(plate_plane))
-        screw_sketch.project(map(lambda c: c.centerSketchPoint, bolt_sketch.circles))
-        for point in screw_sketch.points_without_origin:
-            screw_sketch.add_center_circle(point, BOLT_HOLE_RADIUS)
-            screw_sketch.add_center_circle(point, PLATE_HOLE_RADIUS)
-        screw_sketch.name = "screw"
-
-    plate_screw_ext = root.extrudes.itemByName("plate_screw_ext")
-    if not plate_screw_ext:
-        plate_screw_ext = root.add_one_side_extrude(
-            screw_sketch.profiles,
-            FeatureOperations.CutFeatureOperation,
-            distance=-PLATE_THICKNESS,
-            bodies=plates
-        )
-        plate_screw_ext.name = "plate_screw_ext"
-
-    bolt_screw_ext = root.extrudes.itemByName("bolt_screw_ext")
-    if not bolt_screw_ext:
-        profs = screw_sketch.sorted_profiles
-        bolt_screw_ext = root.add_one_side_extrude(
-            profs[4:8] + profs[12:],
-            FeatureOperations.CutFeatureOperation,
-            to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
-            offset=-WALL_THICKNESS,
-            bodies=cases
-        )
-        bolt_screw_ext.name = "bolt_screw_ext"
+    with stage("screw"):
+        screw_sketch = SketchHelper.wrap(root.find("sketch", "screw"))
+        if not screw_sketch:
+            screw_sketch = SketchHelper.wrap(root.sketches.add(plate_plane))
+            with screw_sketch.batch():
+                for center in geometry.bolt_centers(layout):
+                    point = screw_sketch.add_point(center)
+                    screw_sketch.add_center_circle(point, BOLT_HOLE_RADIUS)
+                    screw_sketch.add_center_circle(point, PLATE_HOLE_RADIUS)
+            root.name("sketch", screw_sketch.sketch, "screw")
+
+        plate_screw_ext = root.find("extrude", "plate_screw_ext")
+        if not plate_screw_ext:
+            plate_screw_ext = root.add_one_side_extrude(
+                screw_sketch.profiles,
+                FeatureOperations.CutFeatureOperation,
+                distance=-PLATE_THICKNESS,
+                bodies=plates
+            )
+            root.name("extrude", plate_screw_ext, "plate_screw_ext")
+
+    with stage("bolt_screw"):
+        bolt_screw_ext = root.find("extrude", "bolt_screw_ext")
+        if not bolt_screw_ext:
+            profs = screw_sketch.sorted_profiles
+            bolt_screw_ext = root.add_one_side_extrude(
+                profs[4:8] + profs[12:],
+                FeatureOperations.CutFeatureOperation,
+                to_entity=BodyHelper(cases[0]).closest_face(Vector(0, 0, 1)),
+                offset=-WALL_THICKNESS,
+                bodies=cases
+            )
+            root.name("extrude", bolt_screw_ext, "bolt_screw_ext")
 
     #################################
     #   holders
     #################################
 
-    lines = pick(plate_sketch.sorted_lines, [-5, -6])
-    p1, p2, p3, p4 = sorted(
-        [lines[0].startSketchPoint, lines[0].endSketchPoint, lines[1].startSketchPoint, lines[1].endSketchPoint],
-        key=lambda p: p.geometry.x
-    )
-    v1 = Vector(dx=p1.geometry.x + HOLDER_DIST, dy=p1.geometry.y)
-    v2 = Vector(dx=p2.geometry.x - HOLDER_DIST, dy=p2.geometry.y)
-    v3 = Vector(dx=p3.geometry.x + HOLDER_DIST, dy=p3.geometry.y)
-    v4 = Vector(dx=p4.geometry.x - HOLDER_DIST, dy=p4.geometry.y)
-
-    holder_sketch = SketchHelper.wrap(root.sketches.itemByName("holder"))
-    if not holder_sketch:
-        holder_sketch = SketchHelper(root.sketches.add(plate_plane))
-        promicro_ploygons = promicro.get_promicro_holder()
-        for p in promicro_ploygons:
-            holder_sketch.add_polygon(p.translate(v1))
-            holder_sketch.add_polygon(p.translate(v4))
-        for p in trrs.get_trrs_holder():
-            holder_sketch.add_polygon(p.translate(v2))
-            holder_sketch.add_polygon(p.translate(v3))
-        holder_sketch.name = "holder"
-
-    holder_ext = root.extrudes.itemByName("holder_ext")
-    if not holder_ext:
-        holder_ext = root.add_one_side_extrude(
-            holder_sketch.profiles,
-            FeatureOperations.JoinFeatureOperation,
-            distance=HOLDER_HEIGHT,
-            bodies=plates,
-        )
-        holder_ext.name = "holder_ext"
+    with stage("holder"):
+        v1, v2, v3, v4 = geometry.holder_anchors(layout)
+
+        holder_sketch = SketchHelper.wrap(root.find("sketch", "holder"))
+        if not holder_sketch:
+            holder_sketch = SketchHelper(root.sketches.add(plate_plane))
+            with holder_sketch.batch():
+                promicro_ploygons = promicro.get_promicro_holder()
+                for p in promicro_ploygons:
+                    holder_sketch.add_polygon(p.translate(v1))
+                    holder_sketch.add_polygon(p.translate(v4))
+                for p in trrs.get_trrs_holder():
+                    holder_sketch.add_polygon(p.translate(v2))
+                    holder_sketch.add_polygon(p.translate(v3))
+            root.name("sketch", holder_sketch.sketch, "holder")
+
+        holder_ext = root.find("extrude", "holder_ext")
+        if not holder_ext:
+            holder_ext = root.add_one_side_extrude(
+                holder_sketch.profiles,
+                FeatureOperations.JoinFeatureOperation,
+                distance=HOLDER_HEIGHT,
+                bodies=plates,
+            )
+            root.name("extrude", holder_ext, "holder_ext")
 
     #################################
     #   breakout
     #################################
 
-    promicro_plane = root.planes.itemByName("promicro")
-    if not promicro_plane:
-        promicro_plane = root.offset_plane( plate_plane,PROMICRO_Y + PROMICRO_T)
-        promicro_plane.name = "promicro"
-
-    promicro_sketch = SketchHelper.wrap(root.sketches.itemByName("promicro"))
-    if not promicro_sketch:
-        promicro_sketch = SketchHelper.wrap(root.sketches.add(promicro_plane))
-        promicro_rect1, promicro_rect2 = promicro.get_promicro_rects()
-        promicro_sketch.add_rect(promicro_rect1.translate(v1))
-        promicro_sketch.add_rect(promicro_rect1.translate(v4))
-        promicro_sketch.add_rect(promicro_rect2.translate(v1))
-        promicro_sketch.add_rect(promicro_rect2.translate(v4))
-        promicro_sketch.name = "promicro"
-
-    promicro_ext = root.extrudes.itemByName("promicro_ext")
-    if not promicro_ext:
-        promicro_ext = root.add_one_side_extrude(
-            promicro_sketch.profiles,
-            FeatureOperations.NewBodyFeatureOperation,
-            distance=-PROMICRO_T
-        )
-        promicro_ext.name = "promicro_ext"
-        for index, body in enumerate(ExtrudeHelper(promicro_ext).sorted_bodies):
-            body.name = f"promicro_{index + 1}"
-
-    usb_ext1 = root.extrudes.itemByName("usb_ext1")
-    if not usb_ext1:
-        usb_ext1 = root.add_one_side_extrude(
-            promicro_sketch.sorted_profiles[-2:],
-            FeatureOperations.NewBodyFeatureOperation,
-            distance=USB_H
-        )
-        usb_ext1.name = "usb_ext1"
-        for index, body in enumerate(ExtrudeHelper(usb_ext1).sorted_bodies):
-            body.name = f"usb_{index + 1}"
-
-    usbs = [b for b in root.bodies if b.name.startswith("usb")]
-
-    usb_ext2 = root.extrudes.itemByName("usb_ext2")
-    if not usb_ext2:
-        root.present_bodies(lambda b: b.name.startswith("promicro") or b.name.startswith("usb"))
-        usb_ext2 = root.add_simple_extrude(
-            map(lambda usb: BodyHelper(usb).closest_face(Vector(dy=1)), usbs),
-            FeatureOperations.JoinFeatureOperation,
-            distance=USB_H,
-        )
-        usb_ext2.name = "usb_ext2"
-        for index, body in enumerate(ExtrudeHelper(usb_ext2).sorted_bodies):
-            body.name = f"promicro_{index+1}"
-
-    promicros = [b for b in root.bodies if b.name.startswith("promicro")]
-
-    trrs_plane = root.planes.itemByName("trrs")
-    if not trrs_plane:
-        trrs_plane = root.offset_plane(plate_plane, TRRS_T)
-        trrs_plane.name = "trrs"
-
-    trrs_sketch = SketchHelper.wrap(root.sketches.itemByName("trrs"))
-    if not trrs_sketch:
-        trrs_sketch = SketchHelper.wrap(root.sketches.add(trrs_plane))
-        trrs_sketch.add_rect(trrs.get_trrs_rect().translate(v2))
-        trrs_sketch.add_rect(trrs.get_trrs_rect().translate(v3))
-        trrs_sketch.name = "trrs"
-
-    trrs_ext1 = root.extrudes.itemByName("trrs_ext1")
-    if not trrs_ext1:
-        trrs_ext1 = root.add_one_side_extrude(
-            trrs_sketch.profiles,
-            FeatureOperations.NewBodyFeatureOperation,
-            distance=-TRRS_T,
-        )
-        trrs_ext1.name = "trrs_ext1"
-        for index, body in enumerate(ExtrudeHelper(trrs_ext1).sorted_bodies):
-            body.name = f"trrs_{index+1}"
+    with stage("promicro"):
+        promicro_plane = root.find("plane", "promicro")
+        if not promicro_plane:
+            promicro_plane = root.offset_plane( plate_plane,PROMICRO_Y + PROMICRO_T)
+            root.name("plane", promicro_plane, "promicro")
+
+        promicro_sketch = SketchHelper.wrap(root.find("sketch", "promicro"))
+        if not promicro_sketch:
+            promicro_sketch = SketchHelper.wrap(root.sketches.add(promicro_plane))
+            with promicro_sketch.batch():
+                promicro_rect1, promicro_rect2 = promicro.get_promicro_rects()
+                promicro_sketch.add_rect(promicro_rect1.translate(v1))
+                promicro_sketch.add_rect(promicro_rect1.translate(v4))
+                promicro_sketch.add_rect(promicro_rect2.translate(v1))
+                promicro_sketch.add_rect(promicro_rect2.translate(v4))
+            root.name("sketch", promicro_sketch.sketch, "promicro")
+
+        promicro_ext = root.find("extrude", "promicro_ext")
+        if not promicro_ext:
+            promicro_ext = root.add_one_side_extrude(
+                promicro_sketch.profiles,
+                FeatureOperations.NewBodyFeatureOperation,
+                distance=-PROMICRO_T
+            )
+            root.name("extrude", promicro_ext, "promicro_ext")
+            for index, body in enumerate(ExtrudeHelper(promicro_ext).sorted_bodies):
+                root.name("body", body, f"promicro_{index + 1}")
+
+    with stage("usb"):
+        usb_ext1 = root.find("extrude", "usb_ext1")
+        if not usb_ext1:
+            usb_ext1 = root.add_one_side_extrude(
+                promicro_sketch.sorted_profiles[-2:],
+                FeatureOperations.NewBodyFeatureOperation,
+                distance=USB_H
+            )
+            root.name("extrude", usb_ext1, "usb_ext1")
+            for index, body in enumerate(ExtrudeHelper(usb_ext1).sorted_bodies):
+                root.name("body", body, f"usb_{index + 1}")
 
-    trrses = [b for b in root.bodies if b.name.startswith("trrs")]
+        usbs = root.prefixed("body", "usb")
+
+        usb_ext2 = root.find("extrude", "usb_ext2")
+        if not usb_ext2:
+            root.present_bodies(lambda name: name.startswith(("promicro", "usb")))
+            usb_ext2 = root.add_simple_extrude(
+                map(lambda usb: BodyHelper(usb).closest_face(Vector(dy=1)), usbs),
+                FeatureOperations.JoinFeatureOperation,
+                distance=USB_H,
+            )
+            root.name("extrude", usb_ext2, "usb_ext2")
+            # the join merges usb and promicro bodies, index the survivors again
+            root.reindex("body")
+            for index, body in enumerate(ExtrudeHelper(usb_ext2).sorted_bodies):
+                root.name("body", body, f"promicro_{index+1}")
+
+        promicros = root.prefixed("body", "promicro")
+
+    with stage("trrs"):
+        trrs_plane = root.find("plane", "trrs")
+        if not trrs_plane:
+            trrs_plane = root.offset_plane(plate_plane, TRRS_T)
+            root.name("plane", trrs_plane, "trrs")
+
+        trrs_sketch = SketchHelper.wrap(root.find("sketch", "trrs"))
+        if not trrs_sketch:
+            trrs_sketch = SketchHelper.wrap(root.sketches.add(trrs_plane))
+            with trrs_sketch.batch():
+                trrs_sketch.add_rect(trrs.get_trrs_rect().translate(v2))
+                trrs_sketch.add_rect(trrs.get_trrs_rect().translate(v3))
+            root.name("sketch", trrs_sketch.sketch, "trrs")
+
+        trrs_ext1 = root.find("extrude", "trrs_ext1")
+        if not trrs_ext1:
+            trrs_ext1 = root.add_one_side_extrude(
+                trrs_sketch.profiles,
+                FeatureOperations.NewBodyFeatureOperation,
+                distance=-TRRS_T,
+            )
+            root.name("extrude", trrs_ext1, "trrs_ext1")
+            for index, body in enumerate(ExtrudeHelper(trrs_ext1).sorted_bodies):
+                root.name("body", body, f"trrs_{index+1}")
+
+        trrses = root.prefixed("body", "trrs")
 
     def trrs_sock(n: int):
-        trrs_sock_sketch = SketchHelper.wrap(root.sketches.itemByName(f"trrs{n}_sock"))
+        trrs_sock_sketch = SketchHelper.wrap(root.find("sketch", f"trrs{n}_sock"))
         if not trrs_sock_sketch:
-            face = BodyHelper(root.bodies.itemByName(f"trrs_{n}")).closest_face(Vector(dy=1))
+            face = BodyHelper(root.find("body", f"trrs_{n}")).closest_face(Vector(dy=1))
             trrs_sock_sketch = SketchHelper.wrap(root.sketches.add(face))
             center = trrs_sock_sketch.add_center_point_of_bounding_box(
                 trrs_sock_sketch.profiles[0].boundingBox
@@ -364,9 +673,9 @@ def main(app: Application):
                 center,
                 TRRS_RADIUS,
             )
-            trrs_sock_sketch.name = f"trrs{n}_sock"
+            root.name("sketch", trrs_sock_sketch.sketch, f"trrs{n}_sock")
 
-        trrs_sock_ext = root.extrudes.itemByName(f"trrs{n}_sock_ext")
+        trrs_sock_ext = root.find("extrude", f"trrs{n}_sock_ext")
         if not trrs_sock_ext:
             trrs_sock_ext = root.add_one_side_extrude(
                 trrs_sock_sketch.sorted_profiles[2:3],
@@ -374,23 +683,37 @@ def main(app: Application):
                 distance=TRRS_L,
                 bodies=trrses,
             )
-            trrs_sock_ext.name = f"trrs{n}_sock_ext"
+            root.name("extrude", trrs_sock_ext, f"trrs{n}_sock_ext")
 
-    trrs_sock(1)
-    trrs_sock(2)
+    with stage("trrs_sock"):
+        trrs_sock(1)
+        trrs_sock(2)
 
     def breakout(toolbodies, name):
         for i in range(2):
             breakout_name = f"{name}_breakout_{i+1}"
-            breakout_ext = root.combines.itemByName(breakout_name)
+            breakout_ext = root.find("combine", breakout_name)
             if not breakout_ext:
                 cut_input = root.combines.createInput(cases[i], toolbodies)
                 cut_input.operation = FeatureOperations.CutFeatureOperation
                 cut_input.isKeepToolBodies = True
                 breakout_ext = root.combines.add(cut_input)
-                breakout_ext.name = breakout_name
-
-    breakout(to_collection(trrses), "trrs")
-    breakout(to_collection(promicros), "usb")
-
-    root.present_bodies(lambda b: b.name.startswith("case") or b.name.startswith("plate"))
+                root.name("combine", breakout_ext, breakout_name)
+
+    with stage("breakout"):
+        if fast:
+            for i in range(2):
+                name = f"breakout_{i + 1}"
+                if not root.find("combine", name):
+                    combine = root.add_combine(
+                        cases[i],
+                        trrses + promicros,
+                        FeatureOperations.CutFeatureOperation,
+                        keep_tools=True,
+                    )
+                    root.name("combine", combine, name)
+        else:
+            breakout(to_collection(trrses), "trrs")
+            breakout(to_collection(promicros), "usb")
+
+    root.present_bodies(lambda name: name.startswith(("case", "plate")))
@@ -0,0 +1,16 @@
+import json
+import sys
+from os import path
+
+import pytest
+
+# the add-in folder is not an installed package, the tests import libs from it
+# the way cli.py does
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def ks63() -> list:
+    with open(path.join(ROOT, "example", "ks-63.json"), encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,99 @@
+from math import pi, sqrt
+import pytest
+from libs import kle
+from libs.common import Point, Polygon, Rect, Vector
+from libs.config import DEFAULT
+
+
+def triangle() -> Polygon:
+    return Polygon([Point(0, 0), Point(2, 0), Point(0, 1)])
+
+
+def test_slotted_primitives():
+    p = Point(1, 2)
+    with pytest.raises(AttributeError):
+        p.w = 3
+    assert p == Point(1, 2, 0) and p.translate(Vector(1, 1)) == Point(2, 3)
+    assert Rect(Point(0, 1), Point(2, 0)).tr == Point(2, 1)
+
+
+def test_polygon_keeps_a_flat_buffer():
+    polygon = triangle()
+    assert list(polygon.coords) == [0, 0, 0, 2, 0, 0, 0, 1, 0]
+    assert polygon.rect == Rect(Point(0, 1), Point(2, 0))
+    assert polygon.points == [Point(0, 0), Point(2, 0), Point(0, 1)]
+
+
+def test_translate_inplace_moves_points_and_rect():
+    polygon = triangle()
+    polygon.rect, polygon.points
+    assert polygon.translate_inplace(Vector(1, -1)) is polygon
+    assert polygon.points == [Point(1, -1), Point(3, -1), Point(1, 0)]
+    assert polygon.rect == Rect(Point(1, 0), Point(3, -1))
+    # the cached rect is moved with the points, not recomputed
+    assert polygon.rect == Polygon(polygon.points).rect
+
+
+def test_mirror_y_inplace():
+    polygon = triangle()
+    polygon.rect
+    polygon.mirror_y_inplace()
+    assert polygon.points == [Point(0, 0), Point(-2, 0), Point(0, 1)]
+    assert polygon.rect == Rect(Point(0, 1), Point(-2, 0))
+
+
+def test_copies_do_not_share_the_buffer():
+    polygon = triangle()
+    moved = polygon.translate(Vector(5))
+    mirrored = polygon.mirror_y()
+    assert polygon == triangle()
+    assert moved.points[1] == Point(7, 0) and mirrored.points[1] == Point(-2, 0)
+    assert moved != polygon
+
+
+def test_layout_translate_inplace_matches_translate(ks63):
+    v = Vector(1.5, -2)
+    moved = kle.from_json(ks63).translate(v)
+    layout = kle.from_json(ks63).translate_inplace(v)
+    assert layout.rect == moved.rect
+    assert layout.left == moved.left and layout.right == moved.right
+    assert list(layout.keys.cx) == list(moved.keys.cx)
+    assert [k.hole for k in layout.keys] == [k.hole for k in moved.keys]
+
+
+def test_runs_follow_rows_templates_and_pitch():
+    config = DEFAULT.replace(SPLIT_KEYS=((1, 3),))
+    data = [
+        ["q", "w", "e", "r", "t", {"w": 2}, "b", "n", {"w": 2}, "m", {"w": 2}, "space"],
+        [{"x": 0.25}, "a", "s", {"x": 0.5}, "d", "f", "g"],
+    ]
+    keys = kle.from_json(data, config).keys
+    u = config.U
+    runs = keys.runs()
+    assert [(r.start, r.count) for r in runs] == [(0, 5), (5, 1), (6, 1), (7, 2), (9, 2), (11, 3)]
+    # the split only cuts the panel between e and r, the holes keep their pitch
+    assert runs[0].pitch == pytest.approx(u)
+    # b and m are not a run with n in between, m and space are one at a 2u pitch
+    assert [keys.names[keys.template[r.start]] for r in runs[1:4]] == ["mx-2u", "mx-1u", "mx-2u"]
+    assert runs[3].pitch == pytest.approx(2 * u)
+    # a row starts a new run, an x offset ends one
+    assert [r.pitch for r in runs[4:6]] == pytest.approx([u, u])
+    assert sum(r.count for r in runs) == len(keys)
+
+
+def test_short_runs_come_out_as_single_keys():
+    keys = kle.from_json([["a", "b", "c", {"x": 1}, "d", "e"]], DEFAULT.replace(SPLIT_KEYS=((1, 3),))).keys
+    assert [(r.start, r.count) for r in keys.runs()] == [(0, 3), (3, 2)]
+    assert [(r.start, r.count) for r in keys.runs(min_count=3)] == [(0, 3), (3, 1), (4, 1)]
+    assert [r.pitch for r in keys.runs(min_count=3)][1:] == [0, 0]
+
+
+def test_rotate_turns_points_and_rect():
+    polygon = triangle().rotate(pi / 2)
+    assert [v for p in polygon.points for v in (p.x, p.y)] == pytest.approx([0, 0, 0, 2, -1, 0], abs=1e-12)
+    assert polygon.rect.p1.x == pytest.approx(-1) and polygon.rect.p2.y == pytest.approx(0)
+    # a two point rect comes out as its four corners, the rect is their bounding box
+    square = Polygon([Point(-1, 1), Point(1, -1)]).rotate(pi / 4)
+    assert len(square.points) == 4
+    assert square.rect.w == pytest.approx(2 * sqrt(2)) == square.rect.h
+    assert triangle().rotate(0) == triangle()
@@ -0,0 +1,53 @@
+from xml.etree import ElementTree
+import pytest
+from libs import export, kle
+from libs.config import DEFAULT
+
+
+def test_plate_entities(ks63):
+    layout = kle.from_json(ks63)
+    layers = [layer for layer, _, _ in export.cut_entities(layout)]
+    assert layers.count("plate") == 2
+    assert layers.count("screws") == 8
+    assert layers.count("holders") > 0
+    assert "keys" not in layers and "panel" not in layers
+
+
+def test_panel_entities(ks63):
+    layout = kle.from_json(ks63)
+    entities = list(export.cut_entities(layout, "panel"))
+    assert [data for layer, _, data in entities if layer == "panel"] == [layout.left.vertices(), layout.right.vertices()]
+    cutouts = sum(len(layout.keys.cutouts(i)) for i in range(len(layout.keys)))
+    assert [layer for layer, _, _ in entities].count("keys") == cutouts >= len(layout.keys)
+
+
+def test_unknown_part(ks63, tmp_path):
+    layout = kle.from_json(ks63)
+    with pytest.raises(ValueError, match="unknown part"):
+        export.write_svg(str(tmp_path / "cut.svg"), layout, "case")
+    assert not (tmp_path / "cut.svg").exists()
+
+
+@pytest.mark.parametrize("part", export.PARTS)
+def test_write_svg(ks63, tmp_path, part):
+    layout = kle.from_json(ks63)
+    export.write_svg(str(tmp_path / "cut.svg"), layout, part)
+    root = ElementTree.parse(tmp_path / "cut.svg").getroot()
+    paths = root.findall("{http://www.w3.org/2000/svg}path")
+    circles = root.findall("{http://www.w3.org/2000/svg}circle")
+    assert len(paths) + len(circles) == len(list(export.cut_entities(layout, part)))
+    # 298 mm of layout plus a margin of two walls on each side
+    assert float(root.get("width")[:-2]) == round(298 + 4 * DEFAULT.WALL_THICKNESS * 10, 3)
+
+
+@pytest.mark.parametrize("part", export.PARTS)
+def test_write_dxf(ks63, tmp_path, part):
+    layout = kle.from_json(ks63)
+    export.write_dxf(str(tmp_path / "cut.dxf"), layout, part)
+    lines = (tmp_path / "cut.dxf").read_text(encoding="ascii").split("\n")
+    pairs = list(zip(lines[0::2], lines[1::2]))
+    assert pairs[-1] == ("0", "EOF")
+    entities = list(export.cut_entities(layout, part))
+    assert pairs.count(("0", "POLYLINE")) == sum(kind == "polyline" for _, kind, _ in entities)
+    assert pairs.count(("0", "POLYLINE")) == pairs.count(("0", "SEQEND"))
+    assert pairs.count(("0", "CIRCLE")) == (8 if part == "plate" else 0)
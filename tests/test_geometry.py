@@ -0,0 +1,74 @@
+import pytest
+from libs import geometry, kle, switches
+from libs.common import Point, Polygon
+from libs.config import DEFAULT, MM
+
+
+def inside(polygon: Polygon, p: Point) -> bool:
+    points, result = polygon.vertices(), False
+    for a, b in zip(points, points[1:] + points[:1]):
+        if (a.y > p.y) != (b.y > p.y) and p.x < a.x + (p.y - a.y) * (b.x - a.x) / (b.y - a.y):
+            result = not result
+    return result
+
+
+def area(polygon: Polygon) -> float:
+    return abs(geometry.signed_area(polygon.vertices()))
+
+
+def test_offset_polygon_moves_every_edge():
+    square = Polygon([Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2)])
+    assert area(geometry.offset_polygon(square, 0.5)) == pytest.approx(9)
+    assert area(geometry.offset_polygon(square, -0.5)) == pytest.approx(1)
+
+
+@pytest.mark.parametrize("switch", ["mx", "choc", "alps"])
+def test_orthogonal_rects_cover_each_template(switch):
+    config = DEFAULT.replace(SWITCH=switch)
+    for name, template in switches.templates(config).items():
+        for polygon in [template] + switches.housings(config).get(name, []):
+            rects = geometry.orthogonal_rects(polygon)
+            assert sum(r.w * r.h for r in rects) == pytest.approx(area(polygon)), name
+
+
+def test_sweep_y_stretches_an_outline():
+    square = Polygon([Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2)])
+    assert area(geometry.sweep_y(square, -1, 0.5)) == pytest.approx(2 * 3.5)
+
+
+def test_case_outlines_are_the_split_halves(ks63):
+    layout = kle.from_json(ks63)
+    left, right = geometry.case_outlines(layout)
+    assert not any(inside(left, p) for p in right.vertices())
+    assert not any(inside(right, p) for p in left.vertices())
+    for case, wall, plate in zip((left, right), geometry.wall_outlines(layout), geometry.plate_outlines(layout)):
+        assert 0 < area(plate) < area(wall) < area(case)
+        assert all(inside(wall, p) for p in plate.vertices())
+
+
+def test_walls_stay_inside_their_half(ks63):
+    layout = kle.from_json(ks63)
+    cases = geometry.case_outlines(layout)
+    for wall, case, other in zip(geometry.wall_outlines(layout), cases, cases[::-1]):
+        assert 0 < area(wall) < area(case)
+        assert all(inside(case, p) for p in wall.vertices())
+        # the wall ring lies between the two outlines, so it never crosses the split gap
+        assert not any(inside(other, p) for p in wall.vertices())
+
+
+def test_bolts_and_holders_sit_inside_the_case(ks63):
+    layout = kle.from_json(ks63)
+    cases = geometry.case_outlines(layout)
+    bolts = geometry.bolt_centers(layout)
+    assert len(bolts) == 8
+    for p in bolts + [Point(v.dx, v.dy) for v in geometry.holder_anchors(layout)]:
+        assert any(inside(case, p) for case in cases)
+    assert 0 < geometry.panel_tilt(layout) < 0.5
+
+
+def test_outlines_follow_the_config(ks63):
+    layout = kle.from_json(ks63)
+    tight, loose = (DEFAULT.replace(PLATE_GAP=gap * MM) for gap in (0.2, 1))
+    for a, b in zip(geometry.plate_outlines(layout, tight), geometry.plate_outlines(layout, loose)):
+        assert area(a) > area(b)
+    assert geometry.plate_outlines(layout) == geometry.plate_outlines(layout, DEFAULT)
@@ -0,0 +1,75 @@
+import json
+import time
+import types
+from libs.instrument import Recorder
+
+
+def api_function():
+    # a builtin that reports itself as part of the fusion api
+    f = [].append
+    f.__module__ = "_core"
+    return f
+
+
+def test_stage_counters():
+    recorder, call = Recorder(instrument=True), api_function()
+    with recorder.stage("panel"):
+        for i in range(3):
+            call(i)
+        len("not an api call")
+        buffer = bytearray(1 << 20)
+        del buffer
+    with recorder.stage("wall"):
+        time.sleep(0.01)
+    panel, wall = recorder.stages
+    assert panel["name"] == "panel" and panel["api_calls"] == 3
+    assert panel["peak_bytes"] >= 1 << 20
+    assert wall["api_calls"] == 0 and wall["peak_bytes"] < 1 << 20
+    assert wall["seconds"] >= 0.01
+
+
+def test_swig_wrapper_is_counted_once():
+    # the python side of a swig call runs in an adsk module and calls the builtin
+    module = types.ModuleType("adsk.core")
+    module.call = api_function()
+    exec("def wrapper(value):\n    return call(value)", module.__dict__)
+    recorder = Recorder(instrument=True)
+    with recorder.stage("panel"):
+        for i in range(4):
+            module.wrapper(i)
+    assert recorder.stages[0]["api_calls"] == 4
+
+
+def test_only_timings_without_instrument():
+    recorder, call = Recorder(), api_function()
+    with recorder.stage("panel"):
+        call(1)
+        buffer = bytearray(1 << 20)
+        del buffer
+    (panel,) = recorder.stages
+    assert panel["api_calls"] == 0 and panel["peak_bytes"] == 0
+    assert panel["seconds"] > 0
+
+
+def test_stage_is_recorded_when_it_fails():
+    recorder = Recorder()
+    try:
+        with recorder.stage("bolt"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert [s["name"] for s in recorder.stages] == ["bolt"]
+
+
+def test_report(tmp_path):
+    recorder, call = Recorder(instrument=True), api_function()
+    for name in ("panel", "wall"):
+        with recorder.stage(name):
+            call(name)
+    report = recorder.report()
+    assert report["api_calls"] == 2
+    assert report["seconds"] == sum(s["seconds"] for s in recorder.stages)
+    recorder.write(tmp_path / "ks-63.stats.json")
+    assert json.loads((tmp_path / "ks-63.stats.json").read_text()) == report
+    lines = recorder.summary().split("\n")
+    assert [l.split()[0] for l in lines] == ["stage", "panel", "wall", "total"]
@@ -0,0 +1,133 @@
+import json
+import os
+from array import array
+import pytest
+import cli
+from libs import kcl, kle
+from libs.common import Vector
+from libs.config import DEFAULT
+from libs.digest import digest
+
+# a split layout with a rotated thumb key on each side
+ERGO = [
+    ["q", "w", "e", {"x": 1}, "u", "i", "o"],
+    ["a", "s", "d", {"x": 1}, "j", "k", "l"],
+    [{"r": 20, "rx": 1, "ry": 3}, "t1"],
+    [{"r": -20, "rx": 6, "ry": 3}, "t2"],
+]
+ERGO_CONFIG = DEFAULT.replace(SPLIT_KEYS=((1, 3), (2, 3)))
+
+
+def json_loads(monkeypatch) -> list:
+    # layouts kle.from_file had to parse from the json
+    calls, from_json = [], kle.from_json
+
+    def counted(data, config=DEFAULT):
+        calls.append(data)
+        return from_json(data, config)
+
+    monkeypatch.setattr(kle, "from_json", counted)
+    return calls
+
+
+@pytest.fixture
+def source(ks63, tmp_path) -> str:
+    file_path = str(tmp_path / "ks-63.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(ks63, f)
+    return file_path
+
+
+def test_round_trip_matches_from_json(ks63, tmp_path):
+    layout = kle.from_json(ks63)
+    kcl.dump(layout, str(tmp_path / "ks-63.kcl"))
+    loaded = kcl.load(str(tmp_path / "ks-63.kcl"))
+    assert digest(loaded) == digest(layout)
+    assert [k.hole.vertices() for k in loaded.keys] == [k.hole.vertices() for k in layout.keys]
+    assert (loaded.name, loaded.author) == (layout.name, layout.author)
+
+
+def test_load_copies_out_of_the_file(ks63, tmp_path):
+    file_path = str(tmp_path / "ks-63.kcl")
+    kcl.dump(kle.from_json(ks63), file_path)
+    loaded = kcl.load(file_path)
+    assert isinstance(loaded.keys.cx, array) and isinstance(loaded.left.coords, array)
+    # the file is closed and unmapped, it can be replaced under the loaded layout
+    expected = digest(loaded)
+    kcl.dump(kle.from_json(ks63, DEFAULT.replace(PANEL_PADDING=0.5)), file_path)
+    os.remove(file_path)
+    assert digest(loaded) == expected
+
+
+def test_round_trip_keeps_rotation(tmp_path):
+    layout = kle.from_json(ERGO, ERGO_CONFIG)
+    kcl.dump(layout, str(tmp_path / "ergo.kcl"), ERGO_CONFIG)
+    loaded = kcl.load(str(tmp_path / "ergo.kcl"), ERGO_CONFIG)
+    assert list(loaded.keys.angle) == list(layout.keys.angle)
+    assert digest(loaded) == digest(layout)
+
+
+def test_config_mismatch(ks63, tmp_path):
+    kcl.dump(kle.from_json(ks63), str(tmp_path / "ks-63.kcl"))
+    with pytest.raises(kcl.FormatError, match="config"):
+        kcl.load(str(tmp_path / "ks-63.kcl"), DEFAULT.replace(WALL_THICKNESS=0.3))
+
+
+@pytest.mark.parametrize("size", [0, 10, 200, -3])
+def test_damaged_file(ks63, tmp_path, size):
+    file_path = str(tmp_path / "ks-63.kcl")
+    kcl.dump(kle.from_json(ks63), file_path)
+    with open(file_path, "rb") as f:
+        data = f.read()
+    with open(file_path, "wb") as f:
+        f.write(data[:size])
+    with pytest.raises(kcl.FormatError):
+        kcl.load(file_path)
+
+
+def test_from_file_uses_a_fresh_sidecar(source, monkeypatch):
+    assert cli.main(["compile", source]) == 0
+    parsed = json_loads(monkeypatch)
+    kle.from_file(source)
+    assert not parsed
+    # an older sidecar is ignored
+    stale = os.path.getmtime(source) - 10
+    os.utime(kcl.sidecar_path(source), (stale, stale))
+    kle.from_file(source)
+    assert len(parsed) == 1
+
+
+def test_from_file_falls_back_on_a_bad_sidecar(ks63, source):
+    expected = digest(kle.from_json(ks63))
+    assert cli.main(["compile", source]) == 0
+    # compiled for another config
+    config = DEFAULT.replace(PANEL_PADDING=0.5)
+    assert digest(kle.from_file(source, config)) == digest(kle.from_json(ks63, config)) != expected
+    # damaged
+    with open(kcl.sidecar_path(source), "wb"):
+        pass
+    assert digest(kle.from_file(source)) == expected
+
+
+def test_cli_validate(source, capsys):
+    assert cli.main(["validate", source]) == 0
+    assert cli.main(["--set", "PANEL_PADDING=0", "validate", source]) == 1
+    assert "overlap" in capsys.readouterr().out
+    assert cli.main(["--set", "NOPE=1", "validate", source]) == 2
+
+
+def test_changed_templates_invalidate_the_sidecar(ks63, source, monkeypatch, capsys):
+    assert cli.main(["compile", source]) == 0
+    templates = kcl.switches.templates
+
+    def wider(config=DEFAULT):
+        return {name: t.translate(Vector(0.01)) for name, t in templates(config).items()}
+
+    monkeypatch.setattr(kcl.switches, "templates", wider)
+    with pytest.raises(kcl.FormatError, match="switch templates"):
+        kcl.load(kcl.sidecar_path(source))
+    parsed = json_loads(monkeypatch)
+    kle.from_file(source)
+    assert len(parsed) == 1
+    assert cli.main(["inspect", kcl.sidecar_path(source)]) == 0
+    assert "shapes match    False" in capsys.readouterr().out
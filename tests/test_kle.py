@@ -0,0 +1,57 @@
+import pytest
+from libs import geometry, kle, preflight, switches
+from libs.common import Vector
+from libs.config import DEFAULT, MM
+
+
+def split_row(data: list) -> int:
+    # index into data of the first row holding a split key
+    rows = [i for i, row in enumerate(data) if isinstance(row, list)]
+    return rows[DEFAULT.SPLIT_KEYS[0][0] - 1]
+
+
+def test_ks63_is_a_clean_split_layout(ks63):
+    layout = kle.from_json(ks63)
+    assert len(layout.keys) == 63
+    assert layout.rect.w == pytest.approx(298 * MM)
+    assert layout.rect.h == pytest.approx(108 * MM)
+    assert layout.rect.rx == pytest.approx(0) and layout.rect.ry == pytest.approx(0)
+    assert preflight.check(layout) == []
+
+
+def test_rotation_follows_kle_serial():
+    # one key turned 15 degrees clockwise about the top left corner of its cell,
+    # next to an upright key at the origin
+    data = [["a"], [{"r": 15, "rx": 1, "ry": 2}, "b"]]
+    keys = kle.from_json(data, DEFAULT.replace(SPLIT_KEYS=((1, 1),))).keys
+    u = DEFAULT.U
+    # undo the centering with the upright key, whose center is (0.5u, -0.5u)
+    ox, oy = 0.5 * u - keys.cx[0], -0.5 * u - keys.cy[0]
+    assert (keys.cx[1] + ox) / u == pytest.approx(1.3536, abs=1e-4)
+    assert (keys.cy[1] + oy) / u == pytest.approx(-2.6124, abs=1e-4)
+    assert keys.angle[1] == pytest.approx(-0.2618, abs=1e-4)
+    assert len(keys.hole(1).vertices()) == 4
+
+
+def test_rotated_keys_grow_the_layout(ks63):
+    upright = kle.from_json(ks63)
+    turned = kle.from_json(ks63 + [[{"r": 30, "rx": 2, "ry": 6}, "t1", "t2"]])
+    assert turned.rect.h > upright.rect.h
+    assert all(len(o.vertices()) >= 4 for o in geometry.case_outlines(turned))
+
+
+def test_rotated_split_key_is_rejected(ks63):
+    row = split_row(ks63)
+    data = ks63[:row] + [[{"r": 10, "rx": 7.5, "ry": 2.5}] + ks63[row]] + ks63[row + 1:]
+    with pytest.raises(ValueError, match="split key"):
+        kle.from_json(data)
+
+
+def test_spacebar_gets_separate_housings():
+    data = [["a"], [{"w": 6.25}, "space"]]
+    keys = kle.from_json(data, DEFAULT.replace(SPLIT_KEYS=((1, 1),))).keys
+    assert len(keys.cutouts(0)) == 1
+    hole, *housings = keys.cutouts(1)
+    assert hole == keys.hole(1)
+    v = Vector(keys.cx[1], keys.cy[1])
+    assert housings == [h.translate(v) for h in switches.housings()["mx-6.25u"]]
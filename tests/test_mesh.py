@@ -0,0 +1,61 @@
+import struct
+import zipfile
+from collections import Counter
+import pytest
+from libs import kle, mesh
+from libs.common import Point
+from libs.config import DEFAULT
+
+
+def open_edges(tris) -> Counter:
+    # every directed edge of a closed, consistently wound mesh has its reverse
+    edges = Counter()
+    for t in tris:
+        t = [tuple(round(v, 9) for v in p) for p in t]
+        for a, b in zip(t, t[1:] + t[:1]):
+            if edges[(b, a)]:
+                edges[(b, a)] -= 1
+            else:
+                edges[(a, b)] += 1
+    return +edges
+
+
+def volume(tris) -> float:
+    # divergence theorem: a closed mesh with outward normals has positive volume
+    return sum(
+        (a[0] * (b[1] * c[2] - b[2] * c[1]) - a[1] * (b[0] * c[2] - b[2] * c[0]) + a[2] * (b[0] * c[1] - b[1] * c[0])) / 6
+        for a, b, c in tris
+    )
+
+
+@pytest.mark.parametrize("key_holes", [False, True])
+def test_plate_mesh_is_watertight(ks63, key_holes):
+    layout = kle.from_json(ks63)
+    tris = list(mesh.triangles(mesh.plate_rings(layout, key_holes), DEFAULT.PLATE_THICKNESS, DEFAULT.PLATE_RAISE))
+    assert tris
+    assert open_edges(tris) == Counter()
+
+
+def test_plate_mesh_faces_outwards(ks63):
+    layout = kle.from_json(ks63)
+    tris = list(mesh.triangles(mesh.plate_rings(layout), DEFAULT.PLATE_THICKNESS, DEFAULT.PLATE_RAISE))
+    assert volume(tris) > 0
+
+
+def test_holes_may_cross_the_outline():
+    square = [Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2)]
+    notch = [Point(1.5, 0.5), Point(1.5, 1), Point(2.5, 1), Point(2.5, 0.5)]
+    tris = list(mesh.triangles([square, notch], 1))
+    assert open_edges(tris) == Counter()
+    assert volume(tris) == pytest.approx(4 - 0.25)
+
+
+def test_write_stl_and_3mf(ks63, tmp_path):
+    layout = kle.from_json(ks63)
+    count = mesh.write_plate(str(tmp_path / "plate.stl"), layout)
+    data = (tmp_path / "plate.stl").read_bytes()
+    assert struct.unpack_from("<I", data, 80)[0] == count
+    assert len(data) == 84 + 50 * count
+    assert mesh.write_plate(str(tmp_path / "plate.3mf"), layout) == count
+    with zipfile.ZipFile(tmp_path / "plate.3mf") as z:
+        assert z.read("3D/3dmodel.model").count(b"<triangle ") == count
@@ -0,0 +1,57 @@
+from libs import kle, preflight
+from libs.config import DEFAULT, MM
+
+CONFIG = DEFAULT.replace(SPLIT_KEYS=((1, 3), (2, 3), (3, 3)))
+ROWS = [
+    ["q", "w", "e", {"x": 1}, "u", "i", "o"],
+    ["a", "s", "d", {"x": 1}, "j", "k", "l"],
+]
+
+
+def messages(data: list, config=CONFIG) -> list:
+    return [i.message for i in preflight.check_keys(kle.from_json(data, config), config)]
+
+
+def split_row(dx: float) -> list:
+    # v is the first key right of the split, dx moves it towards the split key c
+    return ["z", "x", "c", {"x": dx}, "v", {"x": 1 - dx}, "n", "m"]
+
+
+def test_clean_layout():
+    assert messages(ROWS + [split_row(0)]) == []
+
+
+def test_stacked_keys_overlap():
+    assert messages(ROWS + [["z", {"x": -0.5}, "y", "x", "c", {"x": 1}, "n", "m", "b"]]) == ["key 13 (y) overlaps key 12"]
+
+
+def test_key_in_the_split_gap():
+    assert messages(ROWS + [split_row(-0.15)]) == ["key 15 (v) crosses the panel edge or split gap"]
+    assert messages(ROWS + [split_row(-0.05)]) == ["key 15 (v) leaves less than 1 mm of panel"]
+
+
+def test_parts_against_switches(ks63):
+    layout = kle.from_json(ks63)
+    assert preflight.check(layout) == []
+    # bolt bosses grown into the switches under the panel
+    config = DEFAULT.replace(BOLT_OUTER_RADIUS=6 * MM)
+    found = [i.message for i in preflight.check_parts(layout, config)]
+    assert found and all("bolt boss" in m for m in found)
+
+
+def test_summary_is_capped():
+    issues = [preflight.Issue("overlap", f"issue {i}", 0, 0) for i in range(25)]
+    lines = preflight.summary(issues).split("\n")
+    assert len(lines) == 21
+    assert lines[-1] == "... and 5 more"
+
+
+def test_rotated_neighbours_are_checked_on_their_outline():
+    # at 40 degrees the bounding boxes of neighbouring keys overlap, the keys do not
+    cluster = [[{"r": 40, "rx": 0.5, "ry": 3.2}, "t1", "t2"], [{"r": -40, "rx": 6.5, "ry": 3.2, "x": -2}, "t3", "t4"]]
+    layout = kle.from_json(ROWS + cluster, CONFIG)
+    t1, t2 = layout.keys[12].hole.rect, layout.keys[13].hole.rect
+    assert t1.p2.x > t2.p1.x and t1.p2.y < t2.p1.y
+    assert messages(ROWS + cluster) == []
+    # pushed together they do
+    assert "key 13 (t2) overlaps key 12" in messages(ROWS + [[{"r": 40, "rx": 0.5, "ry": 3.2}, "t1", {"x": -0.3}, "t2"]])
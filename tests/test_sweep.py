@@ -0,0 +1,26 @@
+import json
+import pytest
+from libs import sweep
+from libs.config import DEFAULT, MM
+
+
+def test_grid_is_the_product_of_the_axes():
+    configs = sweep.grid(DEFAULT, WALL_THICKNESS=[1.6 * MM, 2 * MM], PLATE_GAP=[0.3 * MM, 0.5 * MM, 0.7 * MM])
+    assert len(configs) == 6 == len(set(configs))
+    assert configs[0] == DEFAULT.replace(WALL_THICKNESS=1.6 * MM, PLATE_GAP=0.3 * MM)
+    assert sweep.config_changes(configs[4]) == {}
+    assert sweep.config_changes(configs[0]) == {"WALL_THICKNESS": 1.6 * MM, "PLATE_GAP": 0.3 * MM}
+
+
+def test_sweep_matches_a_local_evaluation(ks63, tmp_path):
+    configs = sweep.grid(DEFAULT, PLATE_GAP=[0.3 * MM, 0.7 * MM])
+    results = list(sweep.sweep(ks63, configs, processes=2))
+    assert [config for config, _ in results] == configs
+    for config, result in results:
+        assert result == sweep.evaluate(ks63, config)
+        assert result["keys"] == 63 and len(result["bolt_centers"]) == 8
+    narrow, wide = (result["plate_area"] for _, result in results)
+    assert all(a > b for a, b in zip(narrow, wide))
+    rows = sweep.report(results, str(tmp_path / "sweep.json"))
+    assert json.loads((tmp_path / "sweep.json").read_text()) == json.loads(json.dumps(rows))
+    assert [row["config"] for row in rows] == [{"PLATE_GAP": pytest.approx(0.03)}, {"PLATE_GAP": pytest.approx(0.07)}]
@@ -0,0 +1,56 @@
+import pytest
+from libs import switches
+from libs.config import DEFAULT, MM
+
+
+def test_template_names():
+    assert list(switches.templates()) == ["mx-1u", "mx-2u", "mx-3u", "mx-6.25u", "mx-7u", "mx-8u"]
+    assert [switches.template_name(w) for w in (1, 1.75, 2.25, 2.75, 6.25, 6.5, 10)] == [
+        "mx-1u", "mx-1u", "mx-2u", "mx-2u", "mx-6.25u", "mx-6.25u", "mx-8u",
+    ]
+
+
+def test_cutout_sizes():
+    for switch, size in (("mx", (14.4 * MM, 14.4 * MM)), ("choc", (13.8 * MM, 13.8 * MM)), ("alps", (15.5 * MM, 12.8 * MM))):
+        assert switches.cutout_size(DEFAULT.replace(SWITCH=switch)) == pytest.approx(size)
+    with pytest.raises(ValueError, match="unknown switch"):
+        switches.cutout_size(DEFAULT.replace(SWITCH="topre"))
+
+
+def test_alps_has_no_stabilizers():
+    config = DEFAULT.replace(SWITCH="alps")
+    assert list(switches.templates(config)) == ["alps-1u"]
+    assert switches.template_name(6.25, config) == "alps-1u"
+
+
+def test_stabilizer_spacing_moves_the_notches():
+    templates = switches.templates()
+    widths = [t.rect.w for t in templates.values()]
+    assert widths == sorted(widths)
+    # every template is symmetric about x = 0
+    for template in templates.values():
+        xs = sorted(round(p.x, 9) for p in template.vertices())
+        assert xs == sorted(-x for x in xs)
+
+
+def test_only_2u_joins_the_housings_with_a_canal():
+    hole = switches.templates()["mx-2u"]
+    assert len(hole.vertices()) == 36
+    assert hole.rect.p2.x == pytest.approx(DEFAULT.SIDE_NOTCH_DX + DEFAULT.SIDE_NOTCH_W / 2)
+    assert "mx-2u" not in switches.housings()
+
+
+@pytest.mark.parametrize("width, dx", switches.STAB_DX)
+def test_wide_keys_cut_the_housings_separately(width, dx):
+    name = switches.template_name(width)
+    hole, (right, left) = switches.templates()[name], switches.housings()[name]
+    # the plain switch cutout, its rect still clears the housings
+    assert hole.vertices() == switches.plain_hole().vertices()
+    outer = dx + DEFAULT.SIDE_NOTCH_DX - DEFAULT.STB_HOLE_DX + DEFAULT.SIDE_NOTCH_W / 2
+    assert (hole.rect.p1.x, hole.rect.p2.x) == pytest.approx((-outer, outer))
+    assert (right.rect.p1.x, right.rect.p2.x) == pytest.approx((dx - DEFAULT.STB_HOLE_W / 2, outer))
+    assert (left.rect.p1.x, left.rect.p2.x) == pytest.approx((-outer, DEFAULT.STB_HOLE_W / 2 - dx))
+    for housing in (right, left):
+        assert housing.rect.p1.y == pytest.approx(DEFAULT.STB_HOLD_H / 2 - DEFAULT.STB_HOLE_DY)
+        assert housing.rect.p2.y == pytest.approx(-DEFAULT.BOTT_NOTCH_DY - DEFAULT.BOTT_NOTCH_H / 2)
+    assert right.rect.p1.x > hole.vertices()[1].x
@@ -0,0 +1,65 @@
+import json
+from os import path
+import pytest
+from libs import tracer
+
+
+class Sketch:
+    __module__ = "adsk.fusion"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.added = []
+
+    @property
+    def parent(self):
+        return Sketch("parent")
+
+    def add(self, item):
+        self.added.append(item)
+        return item
+
+
+@pytest.fixture
+def api_trace():
+    api_trace = tracer.enable(path.dirname(__file__))
+    yield api_trace
+    tracer.disable()
+
+
+def test_trace_is_a_no_op_when_disabled():
+    sketch = Sketch("panel")
+    assert tracer.trace(sketch) is sketch
+
+
+def test_proxy_forwards_and_unwraps(api_trace):
+    sketch, other = Sketch("panel"), Sketch("wall")
+    proxy = tracer.trace(sketch)
+    assert isinstance(proxy, tracer.Proxy) and isinstance(proxy, Sketch)
+    assert proxy.name == "panel"
+    proxy.name = "plate"
+    assert sketch.name == "plate"
+    # api results come back wrapped, proxy arguments reach the api unwrapped
+    assert type(proxy.parent) is tracer.Proxy
+    assert proxy.add(tracer.trace(other)) == other
+    proxy.add([tracer.trace(other)])
+    assert sketch.added[0] is other and sketch.added[1][0] is other
+    assert tracer.unwrap(proxy) is sketch
+    assert tracer.unwrap((proxy, 1)) == (sketch, 1)
+    assert proxy == sketch and hash(proxy) == hash(tracer.trace(sketch))
+
+
+def test_calls_are_counted_per_call_site(api_trace, tmp_path):
+    proxy = tracer.trace(Sketch("panel"))
+    for _ in range(3):
+        proxy.name
+    proxy.add(1)
+    counts = {key.split(";")[-1]: n for key, n in api_trace.counts.items()}
+    assert counts == {"Sketch.name": 3, "Sketch.add()": 1}
+    site = next(iter(api_trace.counts)).split(";")[0]
+    assert site.startswith("test_tracer.py:test_calls_are_counted_per_call_site:")
+    api_trace.write_trace(tmp_path / "ks-63.trace.json")
+    api_trace.write_folded(tmp_path / "ks-63.folded")
+    events = json.loads((tmp_path / "ks-63.trace.json").read_text())["traceEvents"]
+    assert [e["name"] for e in events] == ["Sketch.name"] * 3 + ["Sketch.add()"]
+    assert len((tmp_path / "ks-63.folded").read_text().splitlines()) == 2